@@ -0,0 +1,223 @@
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import numpy as np
+from sqlalchemy import select
+from cache import TTLCache
+from models import db, Service, ServiceHistory
+
+# History rows fetched per round trip while streaming
+ANALYTICS_CHUNK_SIZE = int(os.environ.get('ANALYTICS_CHUNK_SIZE', 5000))
+
+# Seconds a computed report is reused; the underlying history only grows slowly
+ANALYTICS_TTL = int(os.environ.get('ANALYTICS_TTL', 300))
+
+PERCENTILES = (50, 90, 95)
+
+STATES = ('scheduled', 'in_progress', 'completed', 'cancelled')
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+_STATE_CODES = {state: code for code, state in enumerate(STATES)}
+_STATE_CODES['in-progress'] = _STATE_CODES['in_progress']  # spelling used by older rows
+_OTHER = len(STATES)
+_IN_PROGRESS = _STATE_CODES['in_progress']
+_COMPLETED = _STATE_CODES['completed']
+
+_report_cache = TTLCache(ttl=ANALYTICS_TTL, maxsize=16)
+
+
+def turnaround_report(start=None, end=None, timezone='UTC'):
+    """Turnaround percentiles for services scheduled in [start, end], served from a short-lived cache.
+
+    Scheduled dates are the shop's wall-clock slot times in timezone, while history
+    entries are stamped in UTC; durations are measured after moving both to UTC.
+    """
+    return _report_cache.get_or_set((start, end, timezone), lambda: _compute(start, end, ZoneInfo(timezone)))
+
+
+def _compute(start, end, zone):
+    services = _ServiceTimes()
+    states = _StateDurations()
+    carry = None
+    for chunk in _history_chunks(start, end):
+        if carry is not None:
+            chunk = _concat(carry, chunk)
+        # A service's history may continue in the next chunk; hold its rows back until it does
+        last = chunk['service_id'][-1]
+        split = int(np.searchsorted(chunk['service_id'], last))
+        carry = {key: values[split:] for key, values in chunk.items()}
+        if split:
+            _measure({key: values[:split] for key, values in chunk.items()}, services, states, zone)
+    if carry is not None:
+        _measure(carry, services, states, zone)
+    report = _summarise(services, states)
+    report['timezone'] = zone.key
+    return report
+
+
+def _history_chunks(start, end):
+    """ServiceHistory joined to its service, ordered by (service_id, created_at), as dicts of arrays"""
+    stmt = (select(ServiceHistory.service_id, ServiceHistory.status, ServiceHistory.created_at,
+                   Service.service_type, Service.scheduled_date)
+            .join(Service, Service.id == ServiceHistory.service_id)
+            .where(ServiceHistory.created_at.isnot(None))
+            .order_by(ServiceHistory.service_id, ServiceHistory.created_at, ServiceHistory.id))
+    if start is not None:
+        stmt = stmt.where(Service.scheduled_date >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        stmt = stmt.where(Service.scheduled_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    result = db.session.execute(stmt.execution_options(yield_per=ANALYTICS_CHUNK_SIZE))
+    try:
+        for rows in result.partitions():
+            service_ids, statuses, created, types, scheduled = zip(*rows)
+            yield {
+                'service_id': np.array(service_ids, dtype=np.int64),
+                'state': np.array([_STATE_CODES.get(s, _OTHER) for s in statuses], dtype=np.int8),
+                'at': _hours(created),
+                'service_type': np.array([t or '' for t in types], dtype=object),
+                'scheduled': np.array(scheduled, dtype='datetime64[s]'),
+            }
+    finally:
+        result.close()
+
+
+class _ServiceTimes:
+    """Per-service figures gathered chunk by chunk, concatenated once at the end"""
+
+    def __init__(self):
+        self.parts = []
+
+    def add(self, **arrays):
+        self.parts.append(arrays)
+
+    def arrays(self):
+        if not self.parts:
+            return None
+        return {key: np.concatenate([part[key] for part in self.parts]) for key in self.parts[0]}
+
+
+class _StateDurations:
+    def __init__(self):
+        self.states = []
+        self.hours = []
+
+    def add(self, states, hours):
+        self.states.append(states)
+        self.hours.append(hours)
+
+
+def _measure(chunk, services, states, zone):
+    """Time in each state, and start delay, work time and turnaround per service, for whole services only"""
+    sid, state, at = chunk['service_id'], chunk['state'], chunk['at']
+
+    # Consecutive entries with the same status (e.g. note edits) belong to one stay in that state
+    run_start = np.r_[True, (sid[1:] != sid[:-1]) | (state[1:] != state[:-1])]
+    runs = np.flatnonzero(run_start)
+    run_sid, run_state, run_at = sid[runs], state[runs], at[runs]
+    # A stay ends where the service's next run begins; the last run of each service is still open
+    closed = run_sid[1:] == run_sid[:-1]
+    states.add(run_state[:-1][closed], (run_at[1:] - run_at[:-1])[closed])
+
+    # Per service: first time work started and first completion after it
+    first_rows = np.flatnonzero(np.r_[True, sid[1:] != sid[:-1]])
+    service_ids = sid[first_rows]
+    started = _first_per_service(service_ids, run_sid, run_at, run_state == _IN_PROGRESS)
+    completed = _first_per_service(service_ids, run_sid, run_at, run_state == _COMPLETED)
+    completed = np.where(completed >= np.nan_to_num(started, nan=-np.inf), completed, np.nan)
+
+    # Weekday and slot stay on the shop's clock; the UTC instant is what history times are compared with
+    scheduled = chunk['scheduled'][first_rows]
+    scheduled_utc = _local_to_utc(scheduled, zone)
+    scheduled_hours = np.where(np.isnat(scheduled_utc), np.nan, scheduled_utc.astype(np.int64) / 3600.0)
+    services.add(
+        service_type=chunk['service_type'][first_rows],
+        weekday=np.where(np.isnat(scheduled), -1, (scheduled.astype('datetime64[D]').astype(np.int64) + 3) % 7),
+        slot_minute=np.where(np.isnat(scheduled), -1, (scheduled.astype(np.int64) // 60) % (24 * 60)),
+        start_delay=started - scheduled_hours,
+        work=completed - started,
+        turnaround=completed - scheduled_hours,
+    )
+
+
+def _first_per_service(service_ids, run_sid, run_at, mask):
+    """Earliest run_at per service among runs matching mask, NaN when none"""
+    first = np.full(len(service_ids), np.nan)
+    matching_sid, matching_at = run_sid[mask], run_at[mask]
+    if len(matching_sid):
+        ids, index = np.unique(matching_sid, return_index=True)
+        first[np.searchsorted(service_ids, ids)] = matching_at[index]
+    return first
+
+
+def _summarise(services, states):
+    report = {'services': 0, 'time_in_state_hours': {}, 'by_service_type': {}, 'by_weekday_slot': []}
+    if states.states:
+        state, hours = np.concatenate(states.states), np.concatenate(states.hours)
+        for code, name in enumerate(STATES):
+            report['time_in_state_hours'][name] = _percentiles(hours[state == code])
+
+    figures = services.arrays()
+    if figures is None:
+        return report
+    report['services'] = int(len(figures['service_type']))
+
+    for service_type, rows in _groups(figures['service_type']):
+        report['by_service_type'][service_type or 'unspecified'] = _group_summary(figures, rows)
+
+    # Weekday and slot of the scheduled time, i.e. the booking slot the service was booked into
+    known = np.flatnonzero(figures['weekday'] >= 0)
+    for key, rows in _groups(figures['weekday'][known] * 24 * 60 + figures['slot_minute'][known]):
+        weekday, minute = divmod(int(key), 24 * 60)
+        entry = {'weekday': WEEKDAYS[weekday], 'time': (datetime.min + timedelta(minutes=minute)).strftime('%I:%M %p')}
+        entry.update(_group_summary(figures, known[rows]))
+        report['by_weekday_slot'].append(entry)
+    return report
+
+
+def _groups(keys):
+    """(key, row indices) for each distinct key, from one sort rather than one scan per key"""
+    order = np.argsort(keys, kind='stable')
+    distinct, starts = np.unique(keys[order], return_index=True)
+    return zip(distinct, np.split(order, starts[1:]))
+
+
+def _group_summary(figures, rows):
+    return {
+        'services': int(len(rows)),
+        'completed': int((~np.isnan(figures['turnaround'][rows])).sum()),
+        'start_delay_hours': _percentiles(figures['start_delay'][rows]),
+        'work_hours': _percentiles(figures['work'][rows]),
+        'turnaround_hours': _percentiles(figures['turnaround'][rows]),
+    }
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0}
+    summary = {'count': int(len(values))}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}'] = round(float(value), 2)
+    return summary
+
+
+def _local_to_utc(local, zone):
+    """Naive wall-clock datetime64[s] values in zone as UTC, each with its own offset so DST changes count"""
+    utc = local.copy()
+    known = np.flatnonzero(~np.isnat(local))
+    if not len(known):
+        return utc
+    # Few distinct slot times per chunk, so the offset lookups stay cheap
+    distinct, inverse = np.unique(local[known], return_inverse=True)
+    offsets = np.array([zone.utcoffset(stamp.astype(datetime)).total_seconds() for stamp in distinct], dtype=np.int64)
+    utc[known] = local[known] - offsets[inverse.reshape(-1)].astype('timedelta64[s]')
+    return utc
+
+
+def _concat(first, second):
+    return {key: np.concatenate([first[key], second[key]]) for key in first}
+
+
+def _hours(stamps):
+    stamps = np.array(stamps, dtype='datetime64[s]')
+    return stamps.astype(np.int64) / 3600.0
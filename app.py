@@ -1,24 +1,189 @@
 import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import click
 from flask import Flask
-from models import db
+from sqlalchemy import event, inspect
+from models import db, ServiceDailyRollup
 from routes import app
+from schema import upgrade_schema
+from instrumentation import metrics
+from slowlog import slow_query_log
+from dbpool import pool_options_from_env
+from passwords import passwords
+from assets import assets
+from reminders import send_due_reminders
+import rollup
+import search
 
-# Configuration for the SQLite database connection (easier setup)
-# Using SQLite for development - no separate database server needed
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///vehicle_management.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'thisisasecretkey')
 
-# Initialize the database extension with the application
-db.init_app(app)
+def create_app():
+    """Configure the application defined in routes.py and return it.
+
+    Only configuration happens here; creating tables is left to init_db() so that
+    WSGI worker processes importing the app never run DDL. Safe to call repeatedly.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+
+    # Configuration for the SQLite database connection (easier setup)
+    # Using SQLite for development - no separate database server needed
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///vehicle_management.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection pool sizing, recycling and pre-ping from DB_POOL_* variables; in-memory SQLite keeps its own pool
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options_from_env(os.environ)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'thisisasecretkey')
+    # IANA zone of the shop's wall clock, which slot times are in; timestamps such as created_at are UTC
+    app.config['SHOP_TIMEZONE'] = os.environ.get('SHOP_TIMEZONE', 'UTC')
+    try:
+        ZoneInfo(app.config['SHOP_TIMEZONE'])
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown SHOP_TIMEZONE: {app.config['SHOP_TIMEZONE']!r}")
+    # Per-request timing, SQL counting and Server-Timing headers (off unless asked for)
+    app.config['PERF_INSTRUMENTATION'] = os.environ.get('PERF_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+    # Statements slower than SLOW_QUERY_MS are written, with their plan, to a rotating log (off when unset)
+    app.config['SLOW_QUERY_MS'] = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', os.path.join(app.instance_path, 'slow_queries.log'))
+    app.config['SLOW_QUERY_LOG_MAX_BYTES'] = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    app.config['SLOW_QUERY_LOG_BACKUPS'] = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))
+    # SQLite connection tuning, applied by configure_sqlite() to every new connection
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -20000))  # negative = KiB, so about 20 MB
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+    app.config['SQLITE_TEMP_STORE'] = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    # bcrypt work factor for new hashes (older hashes are upgraded at login)
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Passwords hashed at once on the whole machine; gunicorn shares the limit between its workers
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 1) // 2)))
+    # Write gzip copies of the landing page's text assets at startup and serve them to clients that accept gzip
+    app.config['ASSET_PRECOMPRESS'] = os.environ.get('ASSET_PRECOMPRESS', 'true').lower() in ('1', 'true', 'yes')
+    # Service reminders (flask send-reminders): who is due, how fast to send, and where messages go
+    app.config['REMINDER_CHANNEL'] = os.environ.get('REMINDER_CHANNEL', 'email')
+    app.config['REMINDER_LEAD_DAYS'] = int(os.environ.get('REMINDER_LEAD_DAYS', 7))
+    app.config['REMINDER_LOOKBACK_DAYS'] = int(os.environ.get('REMINDER_LOOKBACK_DAYS', 30))
+    app.config['REMINDER_BATCH_SIZE'] = int(os.environ.get('REMINDER_BATCH_SIZE', 200))
+    app.config['REMINDER_RATE'] = float(os.environ.get('REMINDER_RATE', 10))  # messages per second
+    # A claim still pending after this long belongs to a run that died mid-send; the next run sends it again
+    app.config['REMINDER_PENDING_TIMEOUT_MINUTES'] = int(os.environ.get('REMINDER_PENDING_TIMEOUT_MINUTES', 60))
+    app.config['REMINDER_SENDER'] = os.environ.get('REMINDER_SENDER', 'outbox')
+    app.config['REMINDER_OUTBOX'] = os.environ.get('REMINDER_OUTBOX', os.path.join(app.instance_path, 'outbox'))
+
+    # Initialize the database extension with the application
+    db.init_app(app)
+    passwords.init_app(app)
+    assets.init_app(app, os.path.join(app.root_path, 'landing-page'))
+    rollup.init_app(app)
+    search.init_app(app)
+
+    with app.app_context():
+        configure_sqlite(app, db.engine)
+        if app.config['PERF_INSTRUMENTATION']:
+            metrics.init_app(app, db.engine)
+        if app.config['SLOW_QUERY_MS'] is not None:
+            slow_query_log.init_app(app, db.engine)
+    return app
+
+
+def configure_sqlite(app, engine):
+    """Apply WAL journaling, a busy timeout and cache/sync pragmas to every new SQLite connection.
+
+    WAL lets readers proceed while a booking is being written, and busy_timeout makes a
+    writer wait for the lock instead of failing with "database is locked".
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    journal_mode = app.config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = app.config['SQLITE_SYNCHRONOUS'].upper()
+    temp_store = app.config['SQLITE_TEMP_STORE'].upper()
+    if journal_mode not in ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF'):
+        raise ValueError(f'Unsupported SQLITE_JOURNAL_MODE: {journal_mode}')
+    if synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+        raise ValueError(f'Unsupported SQLITE_SYNCHRONOUS: {synchronous}')
+    if temp_store not in ('DEFAULT', 'FILE', 'MEMORY'):
+        raise ValueError(f'Unsupported SQLITE_TEMP_STORE: {temp_store}')
+    pragmas = [
+        f"busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f'synchronous={synchronous}',
+        f"cache_size={app.config['SQLITE_CACHE_SIZE']}",
+        f"mmap_size={app.config['SQLITE_MMAP_SIZE']}",
+        f'temp_store={temp_store}',
+    ]
+    # In-memory databases have no journal file to switch
+    if engine.url.database not in (None, '', ':memory:'):
+        pragmas.insert(0, f'journal_mode={journal_mode}')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+        finally:
+            cursor.close()
+
+
+def init_db():
+    """Create missing tables and indexes; run once per deployment rather than in every worker"""
+    with app.app_context():
+        # A rollup table added to an existing database starts empty and must be filled from its services
+        rollup_is_new = not inspect(db.engine).has_table(ServiceDailyRollup.__tablename__)
+        # This creates all tables defined in models.py within the connected database
+        db.create_all()
+        # create_all skips tables that already exist, so add any indexes older databases are missing
+        upgrade_schema(app)
+        if rollup_is_new:
+            rollup.rebuild()
+            db.session.commit()
+        # Full-text search tables (SQLite only); fill them when they are new
+        if search.create_tables(db.engine):
+            search.rebuild()
+            db.session.commit()
+        # Forked workers must not inherit the connections opened here
+        db.engine.dispose()
+
+
+create_app()
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and indexes."""
+    init_db()
+
+
+@app.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Recompute the daily service rollup table from all services and payments."""
+    rows = rollup.rebuild()
+    db.session.commit()
+    click.echo(f'{rows} rollup rows written')
+
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Recreate the full-text search index from vehicles, customers and services."""
+    search.create_tables(db.engine)
+    rows = search.rebuild()
+    db.session.commit()
+    click.echo(f'{rows} rows indexed')
+
+
+@app.cli.command('send-reminders')
+@click.option('--lead-days', type=int, help='Remind vehicles due within this many days.')
+@click.option('--rate', type=float, help='Maximum messages per second.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an interrupted run.')
+def send_reminders_command(lead_days, rate, restart):
+    """Send service reminders for vehicles whose next service is coming up."""
+    totals = send_due_reminders(app, restart=restart, lead_days=lead_days, rate=rate)
+    click.echo(', '.join(f'{key}: {value}' for key, value in totals.items()))
 
-# Create the database tables if they don't exist
-with app.app_context():
-    # This creates all tables defined in models.py within the connected database
-    db.create_all()
 
 if __name__ == "__main__":
-    # Docker-friendly configuration
+    # Development server; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
+    init_db()
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from flask import request, send_from_directory, url_for
+
+# Cache lifetime of a URL carrying the asset's content hash (?v=...); its content can never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Types worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Files smaller than this gain nothing from gzip once headers are counted
+MIN_COMPRESS_BYTES = 1024
+
+
+class AssetFingerprints:
+    """Content hashes and optional gzip copies of the landing page's static files.
+
+    Each file is hashed once and the hash is used as its ETag, so a browser revalidating
+    an unchanged file gets a 304. A request that carries the current hash as ?v= is
+    served with a year-long immutable Cache-Control; anything else must revalidate.
+    With ASSET_PRECOMPRESS on, gzip copies are written under the instance folder at
+    startup and served to clients that accept gzip. A file edited on disk is noticed
+    by its size and mtime and re-hashed.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.gzip_dir = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, root):
+        self.root = root
+        self.gzip_dir = os.path.join(app.instance_path, 'compressed-assets') if app.config['ASSET_PRECOMPRESS'] else None
+        app.jinja_env.globals['asset_url'] = self.url_for
+        if not os.path.isdir(root):
+            return
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith('.gz'):
+                    continue
+                try:
+                    self._entry(os.path.relpath(os.path.join(dirpath, filename), root))
+                except OSError:
+                    app.logger.warning('Could not fingerprint asset %s', filename, exc_info=True)
+
+    def fingerprint(self, relpath):
+        """Content hash of the file at relpath under the asset root"""
+        return self._entry(relpath)[2]
+
+    def url_for(self, subdir, filename):
+        """URL of landing-page/<subdir>/<filename> (served by the landing_<subdir> route) with its content hash attached"""
+        endpoint = f'landing_{subdir}'
+        try:
+            version = self.fingerprint(os.path.join(subdir, filename))
+        except (OSError, ValueError):
+            return url_for(endpoint, filename=filename)
+        return url_for(endpoint, filename=filename, v=version)
+
+    def send(self, subdir, filename):
+        """Serve subdir/filename from the asset root with ETag, Cache-Control and gzip when possible"""
+        directory = os.path.join(self.root, subdir)
+        try:
+            _, _, digest, compressed = self._entry(os.path.join(subdir, filename))
+        except (OSError, ValueError):
+            # Missing or outside the root: let send_from_directory produce the 404
+            return send_from_directory(directory, filename)
+
+        # A quality lookup, so "gzip;q=0" counts as refusing gzip rather than naming it
+        if compressed and request.accept_encodings['gzip'] > 0:
+            response = send_from_directory(
+                os.path.dirname(compressed), os.path.basename(compressed),
+                mimetype=mimetypes.guess_type(filename)[0], etag=f'{digest}-gz'
+            )
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(directory, filename, etag=digest)
+        response.vary.add('Accept-Encoding')
+
+        if request.args.get('v') == digest:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def _entry(self, relpath):
+        path = os.path.realpath(os.path.join(self.root, relpath))
+        if not path.startswith(os.path.realpath(self.root) + os.sep):
+            raise ValueError(relpath)
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+            with self._lock:
+                entry = (stat.st_size, stat.st_mtime_ns, _file_hash(path), self._compress(path, relpath, stat.st_size))
+                self._entries[path] = entry
+        return entry
+
+    def _compress(self, path, relpath, size):
+        mimetype = mimetypes.guess_type(path)[0] or ''
+        if self.gzip_dir is None or size < MIN_COMPRESS_BYTES or not mimetype.startswith(COMPRESSIBLE_TYPES):
+            return None
+        target = os.path.join(self.gzip_dir, relpath + '.gz')
+        # Written beside the target and renamed over it, so a worker serving the previous copy
+        # while another recompresses a changed file never sends a half-written body
+        temp = None
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.gz.tmp')
+            with open(path, 'rb') as source, os.fdopen(fd, 'wb') as raw, \
+                    gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9) as out:
+                shutil.copyfileobj(source, out)
+            # Keep the copy only when it is meaningfully smaller
+            if os.path.getsize(temp) >= size * 0.9:
+                os.remove(temp)
+                return None
+            os.replace(temp, target)
+        except OSError:
+            # A read-only instance folder just means serving uncompressed
+            if temp is not None and os.path.exists(temp):
+                os.remove(temp)
+            return None
+        return target
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+assets = AssetFingerprints()
@@ -0,0 +1,85 @@
+"""Service-due forecast over a synthetic fleet: load, projection, ranked due-list and cached calls.
+
+Seeds --vehicles vehicles with --services-per-vehicle completed services each. Each service
+has a random type, date and rising odometer reading. The script then times load_fleet(),
+project_due(), a full due_list() and a repeat due_list() answered from the cache.
+
+    python bench/forecast.py [--vehicles 100000] [--services-per-vehicle 3] [--repeat 3]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from harness import temp_app
+
+
+def seed(app, vehicles, services_per_vehicle, batch=20000):
+    from models import db, User, Vehicle, Service
+    from forecast import SERVICE_INTERVALS
+    rng = random.Random(21)
+    types = list(SERVICE_INTERVALS) + ['detailing']  # one unknown type, scheduled on the default interval
+    now = datetime.utcnow()
+    with app.app_context():
+        owner = User(email='fleet@example.com', password='x', name='Fleet Owner', phone='9800000000', address='Depot')
+        db.session.add(owner)
+        db.session.commit()
+        for first in range(0, vehicles, batch):
+            count = min(batch, vehicles - first)
+            rows = [{'model': 'Civic', 'year': 2020, 'license_plate': f'KA-01-{first + i:07d}',
+                     'vin': f'VIN{first + i:014d}', 'odo_reading': rng.choice([None, rng.randint(1000, 150000)]),
+                     'user_id': owner.id} for i in range(count)]
+            db.session.execute(db.insert(Vehicle), rows)
+            ids = [vehicle_id for (vehicle_id,) in db.session.query(Vehicle.id)
+                   .filter(Vehicle.license_plate.in_([row['license_plate'] for row in rows]))]
+            services = []
+            for vehicle_id in ids:
+                day = now - timedelta(days=rng.randint(400, 1200))
+                odometer = rng.randint(0, 20000)
+                for _ in range(services_per_vehicle):
+                    day += timedelta(days=rng.randint(60, 300))
+                    odometer += rng.randint(2000, 15000)
+                    services.append({'vehicle_id': vehicle_id, 'user_id': owner.id, 'status': 'completed',
+                                     'service_type': rng.choice(types), 'scheduled_date': day, 'actual_date': day,
+                                     'odometer_reading': odometer if rng.random() > 0.1 else None})
+            db.session.execute(db.insert(Service), services)
+            db.session.commit()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehicles', type=int, default=100000)
+    parser.add_argument('--services-per-vehicle', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each step; the best is reported')
+    args = parser.parse_args()
+
+    app = temp_app()
+    _, seconds = timed(lambda: seed(app, args.vehicles, args.services_per_vehicle))
+    print(f'seeded {args.vehicles} vehicles with {args.vehicles * args.services_per_vehicle} services '
+          f'in {seconds:.1f} s')
+
+    from forecast import load_fleet, project_due, due_list, _due_cache
+    with app.app_context():
+        results = {}
+        for _ in range(args.repeat):
+            fleet, load = timed(load_fleet)
+            _, project = timed(lambda: project_due(fleet))
+            _due_cache.clear()
+            due, full = timed(lambda: due_list(horizon_days=30, limit=100))
+            _, cached = timed(lambda: due_list(horizon_days=30, limit=100))
+            for step, value in (('load_fleet', load), ('project_due', project), ('due_list', full),
+                                ('due_list (cached)', cached)):
+                results[step] = min(results.get(step, value), value)
+    for step, value in results.items():
+        print(f'{step:<18} {value * 1000:10.1f} ms')
+    print(f'{len(due)} vehicles due within 30 days returned')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Shared setup for the scripts in bench/: a throwaway SQLite database, seeded accounts and logged-in clients.
+
+Run the scripts from the repository root, e.g. ``python bench/slots.py``. Each one
+creates its database in a temporary directory that is removed when it exits.
+"""
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def temp_app(**environ):
+    """Import the app against a fresh SQLite file and create its tables.
+
+    Must be called before anything imports app or routes, since create_app() reads
+    DATABASE_URL at import time. Extra keyword arguments are set as environment variables.
+    """
+    directory = tempfile.mkdtemp(prefix='vsrms-bench-')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    os.environ.setdefault('ASSET_PRECOMPRESS', 'false')
+    os.environ.update({key: str(value) for key, value in environ.items()})
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from app import app, init_db
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    init_db()
+    return app
+
+
+def database_path(app):
+    from models import db
+    with app.app_context():
+        return db.engine.url.database
+
+
+def add_customer(app, n, password='x'):
+    """Create customer n with one vehicle; returns (user_id, vehicle_id)"""
+    from models import db, User, Vehicle
+    with app.app_context():
+        user = User(email=f'customer{n}@example.com', password=password, name=f'Customer {n}',
+                    phone=f'98{n:08d}', address='Bench Street')
+        db.session.add(user)
+        db.session.flush()
+        vehicle = Vehicle(model='Civic', year=2020, license_plate=f'KA-01-{n:06d}', vin=f'VIN{n:014d}',
+                          odo_reading=1000, user_id=user.id)
+        db.session.add(vehicle)
+        db.session.commit()
+        return user.id, vehicle.id
+
+
+def add_admin(app):
+    from models import db, Admin
+    with app.app_context():
+        admin = Admin(name='Bench Admin', email='admin@example.com', password='x')
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+def login(app, session_id):
+    """Test client whose session is logged in as session_id ('user_<id>' or 'admin_<id>')"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = session_id
+        session['_fresh'] = True
+    return client
+
+
+@contextmanager
+def count_statements(app):
+    """Collect the SQL statements executed inside the block into the yielded list"""
+    from sqlalchemy import event
+    from models import db
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def summary(samples_ms):
+    """p50/p95/max of a list of millisecond timings, formatted for a results table"""
+    ordered = sorted(samples_ms)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f'p50 {statistics.median(ordered):7.2f} ms  p95 {p95:7.2f} ms  max {ordered[-1]:7.2f} ms'
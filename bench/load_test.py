@@ -0,0 +1,120 @@
+"""Throughput of the production gunicorn setup as the number of worker processes grows.
+
+For each worker count the script starts ``gunicorn -c gunicorn.conf.py wsgi:app`` against
+one throwaway SQLite database, then drives it for a fixed time from concurrent HTTP clients
+that are logged in as a customer. The clients request a mix of slot availability and
+booking listings. It reports requests per second, latency percentiles and errors.
+
+    python bench/load_test.py [--workers 1,2,4] [--threads 4] [--clients 16] [--duration 10]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+from harness import ROOT, temp_app, add_customer, summary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def session_cookie(app, session_id):
+    """A signed Flask session cookie logging the bearer in as session_id"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return {app.config['SESSION_COOKIE_NAME']: serializer.dumps({'_user_id': session_id, '_fresh': True})}
+
+
+def wait_until_up(url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {server.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def drive(base_url, cookies, paths, clients, duration):
+    """Request paths round-robin from clients threads for duration seconds; returns (latencies ms, errors)"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        mine, failed = [], 0
+        with requests.Session() as http:
+            http.cookies.update(cookies)
+            i = offset
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                response = http.get(base_url + paths[i % len(paths)], timeout=30)
+                mine.append((time.perf_counter() - started) * 1000)
+                failed += response.status_code >= 400
+                i += 1
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker process counts')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker (GUNICORN_THREADS)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent HTTP clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per worker count')
+    args = parser.parse_args()
+
+    app = temp_app()
+    user_id, _ = add_customer(app, 1)
+    cookies = session_cookie(app, f'user_{user_id}')
+    day = date.today() + timedelta(days=1)
+    weekdays = []
+    while len(weekdays) < 10:
+        if day.weekday() < 5:
+            weekdays.append(day)
+        day += timedelta(days=1)
+    paths = [f'/api/slots/{d.isoformat()}' for d in weekdays] + ['/api/my_bookings']
+
+    print(f'{os.cpu_count()} CPU(s), {args.threads} threads per worker, {args.clients} clients, {args.duration:g} s each')
+    print(f'{"workers":>7}  {"req/s":>8}  {"latency":<48} {"errors":>6}')
+    for workers in (int(w) for w in args.workers.split(',')):
+        port = free_port()
+        env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(args.threads),
+                   GUNICORN_ACCESS_LOG=os.devnull, GUNICORN_MAX_REQUESTS='0')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            wait_until_up(base_url + '/api/debug/db_status', server)
+            # Materialize the slots before timing, so every run measures the same reads
+            drive(base_url, cookies, paths, 1, 0.5)
+            started = time.perf_counter()
+            latencies, errors = drive(base_url, cookies, paths, args.clients, args.duration)
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+        print(f'{workers:>7}  {len(latencies) / elapsed:>8.0f}  {summary(latencies):<48} {errors:>6}')
+
+
+if __name__ == '__main__':
+    main()
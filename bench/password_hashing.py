@@ -0,0 +1,84 @@
+"""Logins per second per core through /login_customer, for several PASSWORD_HASH_WORKERS settings.
+
+For each setting, login threads post valid credentials as fast as they can for a fixed
+time while one client polls a cheap JSON route, /api/my_bookings. The script reports
+logins per second, logins per second per core, and the latency of the polled route, which
+shows how much CPU the hashing leaves for other requests.
+
+    python bench/password_hashing.py [--hash-workers 1,2,4] [--login-threads 16] [--rounds 12] [--duration 8]
+"""
+import argparse
+import os
+import threading
+import time
+
+from harness import temp_app, add_customer, login, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hash-workers', default=None, help='comma-separated PASSWORD_HASH_WORKERS values '
+                                                             '(default: 1, half the cores and all of them)')
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=12, help='BCRYPT_LOG_ROUNDS')
+    parser.add_argument('--duration', type=float, default=8, help='seconds per setting')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    settings = args.hash_workers or ','.join(str(n) for n in sorted({1, max(1, cores // 2), cores}))
+    app = temp_app(BCRYPT_LOG_ROUNDS=args.rounds)
+    from passwords import passwords
+
+    password = 'correct horse battery'
+    with app.app_context():
+        stored_hash = passwords.hash(password)
+    accounts = [add_customer(app, n, password=stored_hash) for n in range(args.login_threads)]
+    poller = login(app, f'user_{accounts[0][0]}')
+
+    print(f'{cores} CPU(s), bcrypt cost {args.rounds}, {args.login_threads} login threads, {args.duration:g} s each')
+    print(f'{"hash threads":>12} {"logins/s":>9} {"per core":>9}  other route latency')
+    for workers in (int(n) for n in settings.split(',')):
+        # The executor is created on first use, so dropping it applies the new size
+        if passwords._executor is not None:
+            passwords._executor.shutdown()
+        passwords._executor = None
+        passwords.workers = workers
+
+        logins, failures, polled = [], [], []
+        lock = threading.Lock()
+        stop_at = time.monotonic() + args.duration
+
+        def log_in(n):
+            client = app.test_client()
+            done = failed = 0
+            while time.monotonic() < stop_at:
+                response = client.post('/login_customer', data={'email': f'customer{n}@example.com',
+                                                                 'password': password})
+                done += response.status_code == 302
+                failed += response.status_code != 302
+            with lock:
+                logins.append(done)
+                failures.append(failed)
+
+        def poll():
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                poller.get('/api/my_bookings')
+                polled.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=log_in, args=(n,)) for n in range(args.login_threads)]
+        threads.append(threading.Thread(target=poll))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        assert not sum(failures), f'{sum(failures)} logins failed'
+        rate = sum(logins) / elapsed
+        print(f'{workers:>12} {rate:>9.1f} {rate / cores:>9.1f}  {summary(polled)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Connection pool behaviour under a multi-threaded load, for a few DB_POOL_* profiles.
+
+Each profile builds an engine from pool_options_from_env(), so it uses the same validation
+and InstrumentedQueuePool as the app. Worker threads repeatedly check out a connection,
+run a query and hold it for --hold-ms, standing in for a request with a slow statement,
+while a monitor samples pool_metrics(). The script reports throughput, peak connections in
+use and overflow, checkout waits and timeouts. It runs on a throwaway SQLite file by
+default; pass --url to point it at a MySQL server (mysql+pymysql://...).
+
+    python bench/pool_harness.py [--profiles 5:10,5:0,2:0] [--threads 16] [--hold-ms 20] [--duration 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from harness import ROOT
+
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError  # noqa: E402
+from dbpool import pool_options_from_env, pool_metrics, pool_stats  # noqa: E402
+
+
+def run(url, environ, threads, hold, duration):
+    engine = create_engine(url, **pool_options_from_env(environ))
+    pool_stats.reset()
+    peak = {'in_use': 0, 'overflow': 0}
+    done = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker():
+        completed = 0
+        while time.monotonic() < stop_at:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT 1')).scalar()
+                    time.sleep(hold)
+                completed += 1
+            except PoolTimeoutError:
+                pass
+        with lock:
+            done.append(completed)
+
+    def monitor():
+        while time.monotonic() < stop_at:
+            current = pool_metrics(engine)
+            peak['in_use'] = max(peak['in_use'], current['in_use'])
+            peak['overflow'] = max(peak['overflow'], current['overflow'])
+            time.sleep(0.005)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)] + [threading.Thread(target=monitor)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return sum(done) / elapsed, peak, pool_stats.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='5:10,5:0,2:0', help='comma-separated DB_POOL_SIZE:DB_MAX_OVERFLOW pairs')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--hold-ms', type=float, default=20, help='how long each checkout keeps its connection')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per profile')
+    parser.add_argument('--timeout', default='1', help='DB_POOL_TIMEOUT in seconds')
+    parser.add_argument('--url', help='database URL; defaults to a throwaway SQLite file')
+    args = parser.parse_args()
+
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='vsrms-bench-'), 'pool.db')
+    print(f'{args.threads} threads holding a connection {args.hold_ms:g} ms per checkout, '
+          f'{args.duration:g} s per profile, DB_POOL_TIMEOUT={args.timeout}')
+    print(f'{"size:overflow":>13} {"checkouts/s":>11} {"peak in use":>11} {"peak overflow":>13} '
+          f'{"mean wait":>10} {"max wait":>10} {"timeouts":>8}')
+    for profile in args.profiles.split(','):
+        size, overflow = profile.split(':')
+        environ = {'DB_POOL_SIZE': size, 'DB_MAX_OVERFLOW': overflow, 'DB_POOL_TIMEOUT': args.timeout}
+        rate, peak, waits = run(url, environ, args.threads, args.hold_ms / 1000, args.duration)
+        print(f'{profile:>13} {rate:>11.0f} {peak["in_use"]:>11} {max(peak["overflow"], 0):>13} '
+              f'{waits["mean_wait_ms"]:>8.1f}ms {waits["max_wait_ms"]:>8.1f}ms {waits["timeouts"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Typeahead latency of /api/admin/search over about a million indexed rows.
+
+Seeds --customers customers with one vehicle each and --services services with short
+free-text notes (300k + 300k + 400k rows by default), fills the FTS5 tables with
+search.rebuild(), then times the endpoint for plate, VIN, name, phone and notes queries
+of increasing length. The target is under 20 ms per request.
+
+    python bench/search.py [--customers 300000] [--services 400000] [--requests 50]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from harness import temp_app, add_admin, login, summary
+
+TARGET_MS = 20
+
+NOTE_WORDS = ('brake', 'pads', 'replaced', 'oil', 'filter', 'coolant', 'leak', 'battery', 'tyre', 'rotation',
+              'alignment', 'clutch', 'gearbox', 'noise', 'wiper', 'blades', 'headlight', 'bulb', 'checked', 'ok')
+
+FIRST_NAMES = ('Aarav', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Nikhil', 'Priya', 'Rahul',
+               'Rohan', 'Sanjay', 'Sneha', 'Tara', 'Vikram', 'Zoya')
+LAST_NAMES = ('Bhat', 'Das', 'Gowda', 'Iyer', 'Joshi', 'Kapoor', 'Kumar', 'Menon', 'Nair', 'Patel', 'Rao',
+              'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma')
+
+QUERIES = ('KA', 'KA-05', 'KA-05-MB', 'KA05MB00', 'VIN000000000123', 'Priya', 'Priya Sh', 'priya.sharma12',
+           '98000123', 'brake pads', 'coolant leak', 'zzz')
+
+
+def plate(n):
+    letters = chr(65 + n // 26 % 26) + chr(65 + n % 26)
+    return f'KA-{n % 60:02d}-{letters}-{n // 676 % 10000:04d}'
+
+
+def seed(app, customers, services, batch=20000):
+    from models import db, User, Vehicle, Service
+    rng = random.Random(25)
+    now = datetime.utcnow()
+    with app.app_context():
+        for first in range(0, customers, batch):
+            count = min(batch, customers - first)
+            users = []
+            for n in range(first, first + count):
+                name = (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+                users.append({'email': f'{name[0]}.{name[1]}{n}@example.com'.lower(), 'password': 'x',
+                              'name': ' '.join(name), 'phone': f'98{n:08d}', 'address': 'Bench Street'})
+            db.session.execute(db.insert(User), users)
+            vehicles = [{'model': rng.choice(('Civic', 'Swift', 'Creta', 'Nexon')), 'year': 2020,
+                         'license_plate': plate(n), 'vin': f'VIN{n:014d}', 'odo_reading': 1000,
+                         'user_id': user_id}
+                        for n, (user_id,) in enumerate(db.session.query(User.id).filter(User.id > first)
+                                                       .order_by(User.id).limit(count), start=first)]
+            db.session.execute(db.insert(Vehicle), vehicles)
+            db.session.commit()
+        for first in range(0, services, batch):
+            rows = []
+            for _ in range(min(batch, services - first)):
+                vehicle_id = rng.randint(1, customers)
+                day = now - timedelta(days=rng.randint(0, 1000))
+                rows.append({'vehicle_id': vehicle_id, 'user_id': vehicle_id, 'status': 'completed',
+                             'service_type': 'general', 'scheduled_date': day,
+                             'notes': ' '.join(rng.sample(NOTE_WORDS, rng.randint(3, 8)))})
+            db.session.execute(db.insert(Service), rows)
+            db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=300000)
+    parser.add_argument('--services', type=int, default=400000)
+    parser.add_argument('--requests', type=int, default=50, help='requests per query')
+    args = parser.parse_args()
+
+    app = temp_app()
+    started = time.perf_counter()
+    seed(app, args.customers, args.services)
+    print(f'seeded {2 * args.customers + args.services} rows in {time.perf_counter() - started:.1f} s')
+
+    import search
+    from models import db
+    with app.app_context():
+        started = time.perf_counter()
+        indexed = search.rebuild()
+        db.session.commit()
+    print(f'indexed {indexed} rows in {time.perf_counter() - started:.1f} s')
+
+    client = login(app, f'admin_{add_admin(app)}')
+    print(f'{"query":<16} {"hits":>5}  latency (target < {TARGET_MS} ms)')
+    worst = 0.0
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            response = client.get('/api/admin/search', query_string={'q': query, 'limit': 10})
+            samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        hits = sum(len(body[kind]) for kind in ('vehicles', 'customers', 'services'))
+        worst = max(worst, sorted(samples)[int(len(samples) * 0.95)])
+        print(f'{query:<16} {hits:>5}  {summary(samples)}')
+    print(f'worst p95 {worst:.2f} ms: {"within" if worst < TARGET_MS else "over"} the {TARGET_MS} ms target')
+
+
+if __name__ == '__main__':
+    main()
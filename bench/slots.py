@@ -0,0 +1,78 @@
+"""Latency of GET /api/slots/<date> as the number of slots per day grows.
+
+For each slots-per-day setting the script views a series of weekdays twice: the first
+view materializes the day's BookingSlot rows, the repeat view only reads them. It reports
+latency percentiles and the SQL statements and commits each kind of view issues, which
+should stay flat as the day gets longer.
+
+    python bench/slots.py [--days 40] [--sizes 5,10,20,50,100]
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from harness import temp_app, add_customer, login, count_statements, summary
+
+
+def slot_times(count):
+    start = datetime(2000, 1, 1, 6, 0)
+    step = timedelta(minutes=max(1, (15 * 60) // count))
+    return [(start + i * step).strftime('%I:%M %p') for i in range(count)]
+
+
+def weekdays(first, count):
+    days = []
+    day = first
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=40, help='distinct dates viewed per size')
+    parser.add_argument('--sizes', default='5,10,20,50,100', help='comma-separated slots per day')
+    args = parser.parse_args()
+
+    app = temp_app()
+    from models import db, SlotSettings
+    from scheduling import slot_settings
+    user_id, _ = add_customer(app, 1)
+    client = login(app, f'user_{user_id}')
+    with app.app_context():
+        commits = []
+        event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+
+    print(f'{"slots/day":>9}  {"view":<7} {"latency":<48} {"SQL/req":>7} {"commits/req":>11}')
+    first_day = date.today() + timedelta(days=1)
+    for offset, size in enumerate(int(s) for s in args.sizes.split(',')):
+        with app.app_context():
+            settings = SlotSettings.query.first() or SlotSettings()
+            settings.slot_times = json.dumps(slot_times(size))
+            settings.default_slots_per_day = size
+            settings.updated_at = datetime.utcnow()
+            db.session.add(settings)
+            db.session.commit()
+            slot_settings.refresh(settings)
+        # A fresh range of dates per size, so every first view really creates its slots
+        days = weekdays(first_day + timedelta(days=offset * args.days * 2), args.days)
+        for view in ('first', 'repeat'):
+            timings = []
+            commits.clear()
+            with count_statements(app) as statements:
+                for day in days:
+                    started = time.perf_counter()
+                    response = client.get(f'/api/slots/{day.isoformat()}')
+                    timings.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200 and len(response.json['slots']) == size, response.json
+            print(f'{size:>9}  {view:<7} {summary(timings):<48} {len(statements) / len(days):>7.1f} '
+                  f'{len(commits) / len(days):>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Read/write throughput on SQLite with the default pragmas versus the tuned ones configure_sqlite() applies.
+
+Each profile runs in its own process against its own throwaway database: reader threads
+request slot availability while writer threads book services into one large slot,
+for a fixed time. The script reports successful reads and writes per second and how many
+requests failed, e.g. with "database is locked".
+
+    python bench/sqlite_concurrency.py [--readers 8] [--writers 4] [--duration 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+# SQLite's own behaviour: rollback journal, full sync, no busy timeout, 2 MB cache, no mmap
+PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': '0',
+        'SQLITE_CACHE_SIZE': '-2000', 'SQLITE_MMAP_SIZE': '0', 'SQLITE_TEMP_STORE': 'DEFAULT',
+    },
+    'tuned': {},  # the app's defaults: WAL, synchronous=NORMAL, 5 s busy timeout, 20 MB cache, mmap
+}
+
+
+def run_profile(readers, writers, duration):
+    """Runs inside the child process; prints one JSON line of results"""
+    from harness import temp_app, add_customer, login
+    app = temp_app()
+    from models import db, BookingSlot
+
+    day = date.today() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    with app.app_context():
+        slot = BookingSlot(date=day, time='09:00 AM', max_bookings=10 ** 9, current_bookings=0)
+        db.session.add(slot)
+        db.session.commit()
+        slot_id = slot.id
+    customers = [add_customer(app, n) for n in range(readers + writers)]
+
+    counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def reader(user_id):
+        client = login(app, f'user_{user_id}')
+        done = failed = 0
+        while time.monotonic() < stop_at:
+            response = client.get(f'/api/slots/{day.isoformat()}')
+            done += 1
+            failed += response.status_code != 200
+        with lock:
+            counts['reads'] += done
+            counts['read_errors'] += failed
+
+    def writer(user_id, vehicle_id):
+        client = login(app, f'user_{user_id}')
+        done = failed = 0
+        while time.monotonic() < stop_at:
+            response = client.post('/api/book_slot', json={
+                'slot_id': slot_id, 'vehicle_id': vehicle_id, 'service_type': 'regular'})
+            done += 1
+            failed += response.status_code != 200
+        with lock:
+            counts['writes'] += done
+            counts['write_errors'] += failed
+
+    threads = [threading.Thread(target=reader, args=(user_id,)) for user_id, _ in customers[:readers]]
+    threads += [threading.Thread(target=writer, args=customer) for customer in customers[readers:]]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counts['seconds'] = time.perf_counter() - started
+    print(json.dumps(counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8, help='reader threads')
+    parser.add_argument('--writers', type=int, default=4, help='writer threads')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per profile')
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args.readers, args.writers, args.duration)
+        return
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.duration:g} s per profile')
+    print(f'{"profile":<8} {"reads/s":>8} {"writes/s":>9} {"failed reads":>13} {"failed writes":>14}')
+    for name, environ in PROFILES.items():
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', name, '--readers', str(args.readers),
+             '--writers', str(args.writers), '--duration', str(args.duration)],
+            env=dict(os.environ, **environ), capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        seconds = result['seconds']
+        reads = (result['reads'] - result['read_errors']) / seconds
+        writes = (result['writes'] - result['write_errors']) / seconds
+        print(f'{name:<8} {reads:>8.0f} {writes:>9.0f} '
+              f'{result["read_errors"]:>13} {result["write_errors"]:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off')
+
+
+def _int_setting(environ, name, default, minimum):
+    raw = environ.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer, got {raw!r}')
+    if value < minimum:
+        raise ValueError(f'{name} must be at least {minimum}, got {value}')
+    return value
+
+
+def pool_options_from_env(environ):
+    """Build SQLALCHEMY_ENGINE_OPTIONS pool settings from DB_POOL_* variables, raising ValueError on bad values.
+
+    Validated at startup so a typo fails the deploy instead of the first request.
+    """
+    pre_ping = environ.get('DB_POOL_PRE_PING', 'true').lower()
+    if pre_ping not in _TRUE + _FALSE:
+        raise ValueError(f'DB_POOL_PRE_PING must be true or false, got {pre_ping!r}')
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _int_setting(environ, 'DB_POOL_SIZE', 5, 1),
+        'max_overflow': _int_setting(environ, 'DB_MAX_OVERFLOW', 10, -1),
+        'pool_timeout': _int_setting(environ, 'DB_POOL_TIMEOUT', 30, 1),
+        # Recycle before the MySQL server or a proxy in front of it closes idle connections
+        'pool_recycle': _int_setting(environ, 'DB_POOL_RECYCLE', 1800, -1),
+        'pool_pre_ping': pre_ping in _TRUE,
+    }
+
+
+class PoolStats:
+    """How long checkouts waited for a connection, and how many gave up"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.timeouts = 0
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'mean_wait_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'timeouts': self.timeouts,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records the time each checkout spends waiting for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def pool_metrics(engine):
+    """Current occupancy of the engine's pool plus the accumulated checkout waits"""
+    pool = engine.pool
+    metrics = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'in_use': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    metrics.update(pool_stats.to_dict())
+    return metrics
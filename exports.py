@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from models import db, User, Vehicle, Service, Payment, BookingSlot, SlotBooking
+
+# Rows fetched from the database per round trip while an export is streaming
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def services_export(start=None, end=None):
+    """Services with their vehicle, owner and payments, one row per payment (or one row if unpaid).
+
+    start and end are inclusive dates on scheduled_date; either may be None.
+    """
+    stmt = (
+        select(
+            Service.id.label('service_id'),
+            Service.service_type,
+            Service.status,
+            Service.scheduled_date,
+            Service.actual_date,
+            Service.cost,
+            Service.odometer_reading,
+            Vehicle.id.label('vehicle_id'),
+            Vehicle.model.label('vehicle_model'),
+            Vehicle.license_plate,
+            User.id.label('user_id'),
+            User.name.label('user_name'),
+            User.email.label('user_email'),
+            Payment.id.label('payment_id'),
+            Payment.amount.label('payment_amount'),
+            Payment.status.label('payment_status'),
+            Payment.payment_method,
+            Payment.payment_date,
+            Payment.transaction_id,
+        )
+        .outerjoin(Vehicle, Vehicle.id == Service.vehicle_id)
+        .outerjoin(User, User.id == Service.user_id)
+        .outerjoin(Payment, Payment.service_id == Service.id)
+        .order_by(Service.id, Payment.id)
+    )
+    if start is not None:
+        stmt = stmt.where(Service.scheduled_date >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        stmt = stmt.where(Service.scheduled_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return stmt
+
+
+def bookings_export(start=None, end=None):
+    """Slot bookings with the date and time of their slot; start and end are inclusive slot dates"""
+    stmt = (
+        select(
+            SlotBooking.id.label('booking_id'),
+            BookingSlot.date.label('slot_date'),
+            BookingSlot.time.label('slot_time'),
+            SlotBooking.status,
+            SlotBooking.service_type,
+            SlotBooking.service_id,
+            SlotBooking.user_id,
+            SlotBooking.vehicle_id,
+            SlotBooking.notes,
+            SlotBooking.created_at,
+            SlotBooking.updated_at,
+        )
+        .join(BookingSlot, BookingSlot.id == SlotBooking.slot_id)
+        .order_by(SlotBooking.id)
+    )
+    if start is not None:
+        stmt = stmt.where(BookingSlot.date >= start)
+    if end is not None:
+        stmt = stmt.where(BookingSlot.date <= end)
+    return stmt
+
+
+def stream_rows(stmt, fmt):
+    """Yield the result of stmt encoded as CSV (with a header line) or NDJSON, one line at a time.
+
+    Rows are fetched EXPORT_CHUNK_SIZE at a time over a streaming cursor, so memory stays
+    flat however many rows match. Run it inside stream_with_context so the session
+    outlives the view function.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    columns = list(result.keys())
+    try:
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+
+            def line(values):
+                writer.writerow(values)
+                text = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                return text
+
+            yield line(columns)
+            for row in result:
+                yield line(['' if value is None else _plain(value) for value in row])
+        else:
+            for row in result:
+                yield json.dumps(dict(zip(columns, (_plain(value) for value in row)))) + '\n'
+    finally:
+        result.close()
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
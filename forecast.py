@@ -0,0 +1,228 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from cache import TTLCache
+from models import db, Vehicle, Service
+
+# Service interval per service_type as (days, km); None means no mileage limit
+SERVICE_INTERVALS = {
+    'regular': (182, 10000),
+    'oil': (182, 8000),
+    'tire': (182, 10000),
+    'brake': (365, 20000),
+    'battery': (365, None),
+    'alignment': (365, 20000),
+    'inspection': (365, None),
+}
+
+# Unknown service types are scheduled on the regular maintenance interval
+DEFAULT_SERVICE_TYPE = 'regular'
+
+# Usage assumed for a vehicle whose history cannot give its own rate, when the fleet has none either
+DEFAULT_KM_PER_DAY = 40.0
+
+# Odometer readings closer together than this are too noisy to estimate a rate from
+MIN_RATE_SPAN_DAYS = 30
+
+# Seconds a computed due-list is reused; projecting the whole fleet takes seconds at 100k vehicles
+FORECAST_TTL = int(os.environ.get('FORECAST_TTL', 300))
+
+_TYPES = tuple(SERVICE_INTERVALS)
+_INTERVAL_DAYS = np.array([SERVICE_INTERVALS[t][0] for t in _TYPES], dtype=np.float64)
+_INTERVAL_KM = np.array([SERVICE_INTERVALS[t][1] or np.inf for t in _TYPES], dtype=np.float64)
+
+_due_cache = TTLCache(ttl=FORECAST_TTL, maxsize=32)
+
+
+class FleetArrays:
+    """Vehicles and their completed-service history as parallel NumPy arrays.
+
+    Dates are float days since the Unix epoch, with NaN where unknown. Services are
+    indexed into the vehicle arrays by position, not by id.
+    """
+
+    def __init__(self, vehicle_ids, odometers, last_service_days, service_vehicles, service_types, service_days, service_odometers):
+        self.vehicle_ids = vehicle_ids
+        self.odometers = odometers
+        self.last_service_days = last_service_days
+        self.service_vehicles = service_vehicles
+        self.service_types = service_types
+        self.service_days = service_days
+        self.service_odometers = service_odometers
+
+    def __len__(self):
+        return len(self.vehicle_ids)
+
+
+def load_fleet():
+    """Bulk-load every vehicle and its completed services with two column-only queries"""
+    vehicles = db.session.query(Vehicle.id, Vehicle.odo_reading, Vehicle.last_service_date).order_by(Vehicle.id).all()
+    services = (db.session.query(Service.vehicle_id, Service.service_type, Service.actual_date, Service.odometer_reading)
+                .filter(Service.status == 'completed', Service.vehicle_id.isnot(None), Service.actual_date.isnot(None))
+                .all())
+
+    vehicle_ids, odometers, last_service = _columns(vehicles, 3)
+    vehicle_ids = np.array(vehicle_ids, dtype=np.int64)
+    service_vehicle_ids, types, actual_dates, service_odometers = _columns(services, 4)
+
+    # Services of vehicles that vanished between the two queries are dropped
+    service_vehicle_ids = np.array(service_vehicle_ids, dtype=np.int64)
+    positions = np.searchsorted(vehicle_ids, service_vehicle_ids)
+    positions = np.minimum(positions, max(len(vehicle_ids) - 1, 0))
+    known = (vehicle_ids[positions] == service_vehicle_ids) if len(vehicle_ids) else np.zeros(len(services), dtype=bool)
+
+    type_index = {name: i for i, name in enumerate(_TYPES)}
+    default_type = type_index[DEFAULT_SERVICE_TYPE]
+    return FleetArrays(
+        vehicle_ids=vehicle_ids,
+        odometers=_floats(odometers),
+        last_service_days=_days(last_service),
+        service_vehicles=positions[known],
+        service_types=np.array([type_index.get(t, default_type) for t in types], dtype=np.int64)[known],
+        service_days=_days(actual_dates)[known],
+        service_odometers=_floats(service_odometers)[known],
+    )
+
+
+def project_due(fleet, now=None):
+    """Project every vehicle's next due date for each service type in one vectorized pass.
+
+    Returns (due_days, due_by_mileage, km_per_day, odometer_now): due_days is a
+    (vehicles, service types) matrix of days since the epoch, due_by_mileage says
+    which limit came first, and the last two are per-vehicle estimates.
+    """
+    today = _day(now or datetime.utcnow())
+    n_vehicles, n_types = len(fleet), len(_TYPES)
+
+    # Usage rate from each vehicle's first and last odometer reading
+    has_odometer = ~np.isnan(fleet.service_odometers)
+    vehicles = fleet.service_vehicles[has_odometer]
+    days = fleet.service_days[has_odometer]
+    odometers = fleet.service_odometers[has_odometer]
+    order = np.lexsort((days, vehicles))
+    vehicles, days, odometers = vehicles[order], days[order], odometers[order]
+    first, last = _group_bounds(vehicles)
+    span = days[last] - days[first]
+    travelled = odometers[last] - odometers[first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where((span >= MIN_RATE_SPAN_DAYS) & (travelled >= 0), travelled / span, np.nan)
+    km_per_day = np.full(n_vehicles, np.nan)
+    km_per_day[vehicles[first]] = rate
+    valid = ~np.isnan(km_per_day)
+    fleet_rate = float(np.median(km_per_day[valid])) if valid.any() else DEFAULT_KM_PER_DAY
+    km_per_day[~valid] = fleet_rate
+
+    # Current odometer: the recorded reading, or the last serviced reading rolled forward if that is higher
+    last_reading_day = np.full(n_vehicles, np.nan)
+    last_reading = np.full(n_vehicles, np.nan)
+    last_reading_day[vehicles[last]] = days[last]
+    last_reading[vehicles[last]] = odometers[last]
+    rolled = last_reading + km_per_day * np.maximum(today - last_reading_day, 0)
+    odometer_now = np.fmax(fleet.odometers, rolled)
+
+    # Latest completed service per (vehicle, service type), falling back to the latest of any type
+    key = fleet.service_vehicles * n_types + fleet.service_types
+    order = np.lexsort((fleet.service_days, key))
+    latest = order[_group_bounds(key[order])[1]]
+    base_day = np.full(n_vehicles * n_types, np.nan)
+    base_odometer = np.full(n_vehicles * n_types, np.nan)
+    base_day[key[latest]] = fleet.service_days[latest]
+    base_odometer[key[latest]] = fleet.service_odometers[latest]
+    base_day = base_day.reshape(n_vehicles, n_types)
+    base_odometer = base_odometer.reshape(n_vehicles, n_types)
+
+    any_day = np.full(n_vehicles, np.nan)
+    any_odometer = np.full(n_vehicles, np.nan)
+    order = np.lexsort((fleet.service_days, fleet.service_vehicles))
+    newest = order[_group_bounds(fleet.service_vehicles[order])[1]]
+    any_day[fleet.service_vehicles[newest]] = fleet.service_days[newest]
+    any_odometer[fleet.service_vehicles[newest]] = fleet.service_odometers[newest]
+    any_day = np.fmax(any_day, fleet.last_service_days)
+
+    missing = np.isnan(base_day)
+    base_day = np.where(missing, any_day[:, None], base_day)
+    base_odometer = np.where(missing, any_odometer[:, None], base_odometer)
+
+    # Never serviced at all: due now
+    by_time = np.where(np.isnan(base_day), today, base_day + _INTERVAL_DAYS)
+    remaining_km = base_odometer + _INTERVAL_KM - odometer_now[:, None]
+    # A parked vehicle (0 km/day) still needs a finite date for its mileage limit
+    by_mileage = today + remaining_km / np.maximum(km_per_day, 0.1)[:, None]
+    by_mileage = np.where(np.isnan(by_mileage), np.inf, by_mileage)
+    due_by_mileage = by_mileage < by_time
+    return np.minimum(by_time, by_mileage), due_by_mileage, km_per_day, odometer_now
+
+
+def due_list(horizon_days=30, limit=100, now=None):
+    """Vehicles due for service within horizon_days (overdue ones included), soonest first.
+
+    Each vehicle appears once, under the service type that falls due first. Served from a
+    short-lived cache unless now is given.
+    """
+    if now is not None:
+        return _compute_due_list(horizon_days, limit, now)
+    return _due_cache.get_or_set((horizon_days, limit),
+                                 lambda: _compute_due_list(horizon_days, limit, datetime.utcnow()))
+
+
+def _compute_due_list(horizon_days, limit, now):
+    fleet = load_fleet()
+    if not len(fleet):
+        return []
+    due_days, due_by_mileage, km_per_day, odometer_now = project_due(fleet, now)
+
+    rows = np.arange(len(fleet))
+    soonest = np.argmin(due_days, axis=1)
+    due = due_days[rows, soonest]
+    within = np.flatnonzero(due <= _day(now) + horizon_days)
+    ranked = within[np.argsort(due[within], kind='stable')][:limit]
+
+    ids = [int(fleet.vehicle_ids[i]) for i in ranked]
+    details = {row.id: row for row in db.session.query(
+        Vehicle.id, Vehicle.model, Vehicle.license_plate, Vehicle.user_id).filter(Vehicle.id.in_(ids))} if ids else {}
+
+    epoch = datetime(1970, 1, 1)
+    due_vehicles = []
+    for vehicle_id, i in zip(ids, ranked):
+        vehicle = details.get(vehicle_id)
+        due_vehicles.append({
+            'vehicle_id': vehicle_id,
+            'model': vehicle.model if vehicle else None,
+            'license_plate': vehicle.license_plate if vehicle else None,
+            'user_id': vehicle.user_id if vehicle else None,
+            'service_type': _TYPES[soonest[i]],
+            'due_date': (epoch + timedelta(days=float(due[i]))).date().isoformat(),
+            'days_until_due': int(np.floor(due[i] - _day(now))),
+            'due_by': 'mileage' if due_by_mileage[i, soonest[i]] else 'time',
+            'km_per_day': round(float(km_per_day[i]), 1),
+            'estimated_odometer': int(odometer_now[i]) if not np.isnan(odometer_now[i]) else None,
+        })
+    return due_vehicles
+
+
+def _group_bounds(sorted_groups):
+    """Indices of the first and last element of each run of equal values in a sorted array"""
+    if not len(sorted_groups):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    return starts, np.r_[starts[1:] - 1, len(sorted_groups) - 1]
+
+
+def _columns(rows, width):
+    return list(zip(*rows)) if rows else [()] * width
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _days(values):
+    stamps = np.array(values, dtype='datetime64[s]')
+    days = stamps.astype(np.int64) / 86400.0
+    days[np.isnat(stamps)] = np.nan
+    return days
+
+
+def _day(moment):
+    return (moment - datetime(1970, 1, 1)).total_seconds() / 86400.0
@@ -129,7 +129,7 @@ class ServiceFilterForm(FlaskForm):
     status = SelectField('Status', choices=[
         ('all', 'All Status'),
         ('scheduled', 'Scheduled'),
-        ('in-progress', 'In Progress'),
+        ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled')
     ])
@@ -0,0 +1,31 @@
+# Gunicorn configuration for production serving of wsgi:app
+# Every setting can be overridden from the environment, e.g. WEB_CONCURRENCY=8 GUNICORN_THREADS=2
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Worker processes and threads per process; gthread workers let slow requests overlap I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    # Create tables and indexes once in the master process instead of on every worker import
+    from app import init_db
+    from passwords import passwords
+    init_db()
+    # One PASSWORD_HASH_WORKERS limit for all workers, which inherit it when they are forked
+    passwords.share_between_processes()
@@ -0,0 +1,60 @@
+import os
+from flask import has_request_context, request
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from cache import TTLCache
+from models import db, User, Admin
+
+# Seconds a loaded account is reused, and how many accounts each worker process keeps. forget_identity
+# only reaches the process that ran the change, so other workers may serve a stale account this long
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 30))
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+
+_identity_cache = TTLCache(ttl=IDENTITY_CACHE_TTL, maxsize=IDENTITY_CACHE_SIZE)
+
+
+def load_identity(session_id):
+    """Return the User or Admin behind a Flask-Login session ID ('user_<id>' / 'admin_<id>').
+
+    Cache hits rebuild the account from its stored column values and attach it to the
+    current session without a query, so it behaves exactly like a freshly loaded row.
+    Requests that may write (anything but GET, HEAD and OPTIONS) always load the row, so
+    an account deleted or changed by another worker cannot act on cached values.
+    """
+    entry = None if _may_write() else _identity_cache.get(session_id)
+    if entry is None:
+        account = _query_identity(session_id)
+        if account is not None:
+            columns = inspect(type(account)).column_attrs
+            _identity_cache.set(session_id, (type(account), {attr.key: getattr(account, attr.key) for attr in columns}))
+        return account
+
+    model, values = entry
+    account = model(**values)
+    make_transient_to_detached(account)
+    return db.session.merge(account, load=False)
+
+
+def forget_identity(account):
+    """Drop a User or Admin from the cache; call after committing changes to it or deleting it"""
+    prefix = 'admin' if isinstance(account, Admin) else 'user'
+    _identity_cache.pop(f"{prefix}_{account.id}")
+    # Sessions created before IDs were prefixed use the bare number
+    _identity_cache.pop(str(account.id))
+
+
+def _may_write():
+    return has_request_context() and request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+
+def _query_identity(session_id):
+    try:
+        # Check if the ID has a prefix to identify the user type
+        if session_id.startswith('admin_'):
+            return db.session.get(Admin, int(session_id[len('admin_'):]))
+        if session_id.startswith('user_'):
+            return db.session.get(User, int(session_id[len('user_'):]))
+        # For backward compatibility, try both (but this shouldn't happen with the new system)
+        return db.session.get(User, int(session_id)) or db.session.get(Admin, int(session_id))
+    except ValueError:
+        return None
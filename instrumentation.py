@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Upper bounds (milliseconds) of the request latency histogram buckets; anything slower lands in +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class EndpointStats:
+    """Running totals and a latency histogram for one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.wall_ms = 0.0
+        self.max_wall_ms = 0.0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, wall_ms, db_ms, template_ms, queries):
+        self.requests += 1
+        self.wall_ms += wall_ms
+        self.max_wall_ms = max(self.max_wall_ms, wall_ms)
+        self.db_ms += db_ms
+        self.template_ms += template_ms
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, wall_ms)] += 1
+
+    def to_dict(self):
+        n = self.requests or 1
+        bounds = list(LATENCY_BUCKETS_MS) + ['+Inf']
+        return {
+            'requests': self.requests,
+            'mean_ms': round(self.wall_ms / n, 3),
+            'max_ms': round(self.max_wall_ms, 3),
+            'mean_db_ms': round(self.db_ms / n, 3),
+            'mean_template_ms': round(self.template_ms / n, 3),
+            'mean_queries': round(self.queries / n, 2),
+            'max_queries': self.max_queries,
+            # [upper bound, count] pairs in bucket order
+            'latency_buckets_ms': [[bound, count] for bound, count in zip(bounds, self.buckets)],
+        }
+
+
+class RequestMetrics:
+    """Opt-in per-request instrumentation: wall time, SQL statement count and time, template render time.
+
+    Each response carries the figures in a Server-Timing header and they are folded
+    into per-endpoint histograms that the admin metrics endpoint reports. Streamed
+    responses are measured once their body has been sent and get no header.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_template, app)
+        template_rendered.connect(self._finish_template, app)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        self.enabled = True
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def _start_request(self):
+        g._perf = {'start': time.perf_counter(), 'queries': 0, 'db': 0.0, 'template': 0.0, 'template_started': []}
+
+    def _finish_request(self, response):
+        perf = g.get('_perf')
+        if perf is None:
+            return response
+        endpoint = request.endpoint or '<unmatched>'
+        if response.is_streamed:
+            # The body, and the queries behind it, are produced after this hook returns, so a
+            # streamed response is measured when it is closed. Its headers have been sent by
+            # then, so it carries no Server-Timing header
+            response.call_on_close(lambda: self._record(endpoint, perf))
+            return response
+        g.pop('_perf')
+        wall_ms, db_ms, template_ms = self._record(endpoint, perf)
+        response.headers.add(
+            'Server-Timing',
+            f'app;dur={wall_ms:.1f}, db;dur={db_ms:.1f};desc="{perf["queries"]} queries", tpl;dur={template_ms:.1f}'
+        )
+        return response
+
+    def _record(self, endpoint, perf):
+        wall_ms = (time.perf_counter() - perf['start']) * 1000
+        db_ms = perf['db'] * 1000
+        template_ms = perf['template'] * 1000
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.observe(wall_ms, db_ms, template_ms, perf['queries'])
+        return wall_ms, db_ms, template_ms
+
+    def _start_template(self, sender, template, context, **extra):
+        perf = g.get('_perf')
+        if perf is not None:
+            perf['template_started'].append(time.perf_counter())
+
+    def _finish_template(self, sender, template, context, **extra):
+        perf = g.get('_perf')
+        if perf is not None and perf['template_started']:
+            perf['template'] += time.perf_counter() - perf['template_started'].pop()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('perf_query_start')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        # Statements run outside a request (CLI commands, startup) are not attributed to any endpoint
+        if has_request_context():
+            perf = g.get('_perf')
+            if perf is not None:
+                perf['queries'] += 1
+                perf['db'] += elapsed
+
+
+metrics = RequestMetrics()
@@ -23,6 +23,10 @@ class User(db.Model, UserMixin):
         return self.id
 
 class Vehicle(db.Model):
+    __table_args__ = (
+        db.Index('ix_vehicle_user_id', 'user_id'),
+        db.Index('ix_vehicle_next_service_date_id', 'next_service_date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     model = db.Column(db.String(100))
     year = db.Column(db.Integer)
@@ -35,6 +39,12 @@ class Vehicle(db.Model):
     services = db.relationship('Service', backref='vehicle', lazy=True)
 
 class Service(db.Model):
+    __table_args__ = (
+        db.Index('ix_service_user_id_scheduled_date', 'user_id', 'scheduled_date'),
+        db.Index('ix_service_status_scheduled_date', 'status', 'scheduled_date'),
+        db.Index('ix_service_scheduled_date_id', 'scheduled_date', 'id'),
+        db.Index('ix_service_vehicle_id', 'vehicle_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     service_type = db.Column(db.String(50))
     scheduled_date = db.Column(db.DateTime)
@@ -50,6 +60,9 @@ class Service(db.Model):
     user = db.relationship('User', backref='user_services', lazy=True)
 
 class ServiceHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_service_history_service_id_created_at', 'service_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'))
     status = db.Column(db.String(20))
@@ -57,6 +70,11 @@ class ServiceHistory(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Payment(db.Model):
+    __table_args__ = (
+        db.Index('ix_payment_service_id', 'service_id'),
+        # Covers the dashboard's per-status payment count and total
+        db.Index('ix_payment_status_amount', 'status', 'amount'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'))
     amount = db.Column(db.Float)
@@ -89,6 +107,9 @@ class Admin(db.Model, UserMixin):
 # Calendar Slot Booking Models
 class BookingSlot(db.Model):
     __tablename__ = 'booking_slots'
+    __table_args__ = (
+        db.Index('uq_booking_slots_date_time', 'date', 'time', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.String(10), nullable=False)  # e.g., "09:00 AM"
@@ -96,6 +117,7 @@ class BookingSlot(db.Model):
     current_bookings = db.Column(db.Integer, default=0)
     is_available = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # versions the slot availability ETag
     bookings = db.relationship('SlotBooking', backref='slot', lazy=True)
     
     def is_fully_booked(self):
@@ -103,6 +125,10 @@ class BookingSlot(db.Model):
 
 class SlotBooking(db.Model):
     __tablename__ = 'slot_bookings'
+    __table_args__ = (
+        db.Index('ix_slot_bookings_user_id_status', 'user_id', 'status'),
+        db.Index('ix_slot_bookings_slot_id_status', 'slot_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     slot_id = db.Column(db.Integer, db.ForeignKey('booking_slots.id'), nullable=False)
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=True)
@@ -133,3 +159,31 @@ class NonWorkingDay(db.Model):
     is_recurring = db.Column(db.Boolean, default=False)  # For recurring holidays
     created_by = db.Column(db.Integer, db.ForeignKey('admin.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ServiceReminder(db.Model):
+    """One reminder sent (or claimed) for a vehicle's next_service_date on a channel; the unique key stops repeats"""
+    __tablename__ = 'service_reminders'
+    __table_args__ = (
+        db.Index('uq_service_reminders_vehicle_due_channel', 'vehicle_id', 'due_date', 'channel', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    due_date = db.Column(db.DateTime, nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # email, sms
+    recipient = db.Column(db.String(120))
+    status = db.Column(db.String(20), default='pending')  # pending, sent, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)  # when a run last took it to send; a pending claim that grows old was abandoned
+    sent_at = db.Column(db.DateTime)
+
+class ServiceDailyRollup(db.Model):
+    """Services per scheduled day, service type and status with their cost and completed payments, kept by rollup.py"""
+    __tablename__ = 'service_daily_rollup'
+    day = db.Column(db.Date, primary_key=True)
+    service_type = db.Column(db.String(50), primary_key=True)  # '' when the service has none
+    status = db.Column(db.String(20), primary_key=True)
+    service_count = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+    paid_amount = db.Column(db.Float, nullable=False, default=0)
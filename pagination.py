@@ -0,0 +1,72 @@
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing plus the cursor for the page after it"""
+
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(sort_value, row_id):
+    """Encode the position of the last row on a page as '<iso datetime>_<id>' (the datetime part may be empty)"""
+    return f"{sort_value.isoformat() if sort_value is not None else ''}_{row_id}"
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    sort_part, _, id_part = cursor.rpartition('_')
+    sort_value = datetime.fromisoformat(sort_part) if sort_part else None
+    return sort_value, int(id_part)
+
+
+def _after(sort_column, id_column, sort_value, last_id, descending):
+    # SQLite and MySQL sort NULLs first ascending and last descending, so NULL dates form their own run
+    if sort_column is None:
+        return id_column < last_id if descending else id_column > last_id
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(sort_column < sort_value,
+                   and_(sort_column == sort_value, id_column < last_id),
+                   sort_column.is_(None))
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > last_id), sort_column.isnot(None))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+
+
+def keyset_paginate(query, id_column, sort_column=None, cursor=None, per_page=PER_PAGE, descending=False,
+                    max_per_page=MAX_PER_PAGE):
+    """Return the page of query that follows cursor, ordered by (sort_column, id_column).
+
+    Each page is a bounded range read on the (sort_column, id) index however deep
+    the listing goes, unlike OFFSET which rereads every skipped row. per_page is
+    clamped to max_per_page, which protects listings that take it from a request.
+    """
+    per_page = max(1, min(per_page or PER_PAGE, max_per_page))
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = query.filter(_after(sort_column, id_column, sort_value, last_id, descending))
+
+    order = [id_column.desc() if descending else id_column.asc()]
+    if sort_column is not None:
+        order.insert(0, sort_column.desc() if descending else sort_column.asc())
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(sort_value, getattr(last, id_column.key))
+    return KeysetPage(rows, next_cursor, per_page)
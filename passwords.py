@@ -0,0 +1,78 @@
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask_bcrypt import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a small, bounded pool of worker threads.
+
+    bcrypt releases the GIL, so a burst of logins on the request threads would otherwise
+    occupy every core at once. Running them on at most PASSWORD_HASH_WORKERS threads
+    caps the CPU that hashing can take and leaves the rest for other routes; a request
+    thread just waits for its turn. On its own the pool only bounds one process, so a
+    forking server calls share_between_processes() in its master before the workers
+    start, and every worker then also takes one of the same PASSWORD_HASH_WORKERS slots
+    around each hash. The work factor is BCRYPT_LOG_ROUNDS, and hashes made at a
+    different cost are upgraded on the next successful login.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._shared_slots = None
+
+    def init_app(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+
+    def share_between_processes(self):
+        """Make PASSWORD_HASH_WORKERS a limit for this process and every process forked from it.
+
+        Call once, after init_app and before forking; the semaphore is inherited by the children.
+        """
+        self._shared_slots = multiprocessing.BoundedSemaphore(self.workers)
+
+    def hash(self, password):
+        """A new hash of password at the configured cost, as a str ready to store"""
+        return self._run(generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True when stored_hash was made with a cost other than the configured one"""
+        if isinstance(stored_hash, bytes):
+            stored_hash = stored_hash.decode('utf-8')
+        # '$2b$<cost>$<salt and digest>'
+        parts = stored_hash.split('$')
+        return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != self.rounds
+
+    def upgrade(self, account, password):
+        """After a successful login, re-hash account's password at the current cost if needed.
+
+        Returns True when account.password was replaced; the caller commits.
+        """
+        if not self.needs_rehash(account.password):
+            return False
+        account.password = self.hash(password)
+        return True
+
+    def _run(self, fn, *args):
+        # Created on first use so that a forking server starts the threads in each worker
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor.submit(self._call, fn, *args).result()
+
+    def _call(self, fn, *args):
+        if self._shared_slots is None:
+            return fn(*args)
+        with self._shared_slots:
+            return fn(*args)
+
+
+passwords = PasswordHasher()
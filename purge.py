@@ -0,0 +1,67 @@
+from sqlalchemy import delete, update, select, func, or_
+from models import db, User, Vehicle, Service, ServiceHistory, Payment, BookingSlot, SlotBooking, ServiceReminder
+from rollup import service_days, refresh_days
+import search
+
+# Set-based removal of a customer's or a vehicle's data. Each function issues a fixed number of
+# DELETE/UPDATE statements however many rows are involved, and leaves the commit to the caller
+# so the whole purge is one transaction.
+
+
+def _execute(statement):
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def _release_slot_capacity(bookings):
+    """Hand back one place per confirmed booking matched by the bookings condition, in one UPDATE"""
+    confirmed = (SlotBooking.status == 'confirmed', bookings)
+    released = (select(func.count(SlotBooking.id))
+                .where(SlotBooking.slot_id == BookingSlot.id, *confirmed)
+                .scalar_subquery())
+    return _execute(
+        update(BookingSlot)
+        .where(BookingSlot.id.in_(select(SlotBooking.slot_id).where(*confirmed)))
+        .values(current_bookings=BookingSlot.current_bookings - released)
+    )
+
+
+def _purge(bookings, services):
+    """Delete bookings, then payments, history and services, freeing slot capacity first"""
+    service_ids = select(Service.id).where(services)
+    # Read before the services go; the rollup rows of these days are recomputed at the end
+    days = service_days(services)
+    search.forget(Service, services)
+    counts = {'slots_released': _release_slot_capacity(bookings)}
+    counts['bookings'] = _execute(delete(SlotBooking).where(bookings))
+    counts['payments'] = _execute(delete(Payment).where(Payment.service_id.in_(service_ids)))
+    counts['history'] = _execute(delete(ServiceHistory).where(ServiceHistory.service_id.in_(service_ids)))
+    # Filtered directly rather than through service_ids: MySQL will not delete from a table it is subquerying
+    counts['services'] = _execute(delete(Service).where(services))
+    refresh_days(days)
+    return counts
+
+
+def purge_vehicle(vehicle_id):
+    """Delete a vehicle with its bookings, services, payments and service history"""
+    counts = _purge(SlotBooking.vehicle_id == vehicle_id, Service.vehicle_id == vehicle_id)
+    counts['reminders'] = _execute(delete(ServiceReminder).where(ServiceReminder.vehicle_id == vehicle_id))
+    search.forget(Vehicle, Vehicle.id == vehicle_id)
+    counts['vehicles'] = _execute(delete(Vehicle).where(Vehicle.id == vehicle_id))
+    return counts
+
+
+def purge_user(user_id):
+    """Delete a customer account with its vehicles and everything that hangs off them"""
+    vehicle_ids = select(Vehicle.id).where(Vehicle.user_id == user_id)
+    counts = _purge(
+        or_(SlotBooking.user_id == user_id, SlotBooking.vehicle_id.in_(vehicle_ids)),
+        or_(Service.user_id == user_id, Service.vehicle_id.in_(vehicle_ids))
+    )
+    counts['reminders'] = _execute(delete(ServiceReminder).where(
+        or_(ServiceReminder.user_id == user_id, ServiceReminder.vehicle_id.in_(vehicle_ids))
+    ))
+    search.forget(Vehicle, Vehicle.user_id == user_id)
+    search.forget(User, User.id == user_id)
+    counts['vehicles'] = _execute(delete(Vehicle).where(Vehicle.user_id == user_id))
+    counts['users'] = _execute(delete(User).where(User.id == user_id))
+    return counts
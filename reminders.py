@@ -0,0 +1,258 @@
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Vehicle, ServiceReminder
+from pagination import keyset_paginate, MAX_PER_PAGE
+
+
+class OutboxSender:
+    """Stand-in sender that appends each message as a JSON line to <directory>/<YYYY-MM-DD>.jsonl"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{datetime.utcnow():%Y-%m-%d}.jsonl')
+        with self._lock, open(path, 'a', encoding='utf-8') as outbox:
+            outbox.write(json.dumps(message) + '\n')
+
+
+def load_sender(app):
+    """The sender named by REMINDER_SENDER: 'outbox', or 'module:factory' called with the app"""
+    spec = app.config['REMINDER_SENDER']
+    if spec == 'outbox':
+        return OutboxSender(app.config['REMINDER_OUTBOX'])
+    module_name, _, factory = spec.partition(':')
+    return getattr(importlib.import_module(module_name), factory)(app)
+
+
+class RateLimiter:
+    """Token bucket allowing rate acquisitions per second, with bursts of at most one second's worth"""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = 1.0
+        self._last = clock()
+
+    def acquire(self):
+        while True:
+            now = self.clock()
+            self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            self.sleep((1 - self._tokens) / self.rate)
+
+
+class ReminderJob:
+    """Sends one reminder per vehicle whose next_service_date falls in the reminder window.
+
+    Vehicles are read in keyset chunks on (next_service_date, id), so every read is a
+    short range scan on ix_vehicle_next_service_date_id. For each chunk the job skips
+    vehicles already reminded for that due date on this channel, claims the rest by
+    inserting pending ServiceReminder rows (the unique key makes a concurrent run's
+    claim fail instead of double-sending), sends them at no more than `rate` messages
+    per second, and records the outcome. Each chunk is its own short transaction and
+    the chunk cursor is written to a checkpoint file, so an interrupted run resumes
+    where it stopped. A failed send is retried by the next run, and so is a claim left
+    pending for longer than pending_timeout_minutes by a run that died before recording
+    its outcome; both take over the existing row with a conditional UPDATE, since the
+    unique key rules out inserting a second one.
+    """
+
+    def __init__(self, app, sender, channel='email', lead_days=7, lookback_days=30, batch_size=MAX_PER_PAGE,
+                 rate=10, checkpoint_path=None, pending_timeout_minutes=60, now=None):
+        self.app = app
+        self.sender = sender
+        self.channel = channel
+        self.now = now or datetime.utcnow()
+        # Due within the next lead_days, or overdue by no more than lookback_days
+        self.window = (self.now - timedelta(days=lookback_days), self.now + timedelta(days=lead_days))
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be at least 1, got {batch_size}')
+        self.batch_size = batch_size
+        if rate <= 0:
+            raise ValueError(f'rate must be greater than 0 messages per second, got {rate}')
+        self.limiter = RateLimiter(rate)
+        self.checkpoint_path = checkpoint_path
+        self.pending_timeout = timedelta(minutes=pending_timeout_minutes)
+
+    def run(self, restart=False):
+        totals = {'scanned': 0, 'already_sent': 0, 'retried': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+        cursor = None if restart else self._load_checkpoint()
+        while True:
+            # The listing cap on page size is meant for request input, not for this configured chunk size
+            page = keyset_paginate(self._due_vehicles(), Vehicle.id, Vehicle.next_service_date,
+                                   cursor=cursor, per_page=self.batch_size, max_per_page=self.batch_size)
+            # End the read transaction before sending anything
+            db.session.commit()
+            for key, count in self._process(page.items).items():
+                totals[key] += count
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+            self._save_checkpoint(cursor)
+        self._clear_checkpoint()
+        return totals
+
+    def _due_vehicles(self):
+        start, end = self.window
+        return (db.session.query(Vehicle.id, Vehicle.next_service_date, Vehicle.model, Vehicle.license_plate,
+                                 User.id.label('user_id'), User.name, User.email, User.phone)
+                .join(User, User.id == Vehicle.user_id)
+                .filter(Vehicle.next_service_date >= start, Vehicle.next_service_date <= end))
+
+    def _process(self, rows):
+        counts = {'scanned': len(rows), 'already_sent': 0, 'retried': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+        if not rows:
+            return counts
+        now = datetime.utcnow()
+        previous = {
+            (reminder.vehicle_id, reminder.due_date): reminder
+            for reminder in db.session.query(ServiceReminder.id, ServiceReminder.vehicle_id, ServiceReminder.due_date,
+                                             ServiceReminder.status, ServiceReminder.claimed_at,
+                                             ServiceReminder.created_at)
+            .filter(ServiceReminder.channel == self.channel,
+                    ServiceReminder.vehicle_id.in_([row.id for row in rows]))
+        }
+        by_vehicle = {row.id: row for row in rows}
+        claims = []
+        retries = []
+        for row in rows:
+            previous_reminder = previous.get((row.id, row.next_service_date))
+            if previous_reminder is not None and not self._retryable(previous_reminder, now):
+                counts['already_sent'] += 1
+                continue
+            recipient = row.phone if self.channel == 'sms' else row.email
+            if not recipient:
+                counts['skipped'] += 1
+                continue
+            if previous_reminder is None:
+                claims.append(ServiceReminder(vehicle_id=row.id, user_id=row.user_id, due_date=row.next_service_date,
+                                              channel=self.channel, recipient=recipient, status='pending',
+                                              claimed_at=now))
+            else:
+                retries.append((previous_reminder.id, row, recipient))
+        if not claims and not retries:
+            db.session.commit()
+            return counts
+
+        db.session.add_all(claims)
+        try:
+            db.session.flush()
+            # Read before the commit expires them, so sending needs no further queries
+            claimed = [(claim.id, by_vehicle[claim.vehicle_id], claim.recipient) for claim in claims]
+            retried = []
+            for reminder_id, row, recipient in retries:
+                # Still failed or abandoned, so no other run has taken it over since it was read
+                taken = db.session.execute(
+                    update(ServiceReminder)
+                    .where(ServiceReminder.id == reminder_id, self._retryable_condition(now))
+                    .values(status='pending', recipient=recipient, error=None, claimed_at=now)
+                ).rowcount
+                if taken:
+                    retried.append((reminder_id, row, recipient))
+            db.session.commit()
+        except IntegrityError:
+            # Another run claimed part of this chunk first; leave the whole chunk to it
+            db.session.rollback()
+            self.app.logger.warning('Reminder chunk starting at vehicle %s was claimed by another run', rows[0].id)
+            counts['already_sent'] += len(claims) + len(retries)
+            return counts
+        counts['retried'] = len(retried)
+        counts['already_sent'] += len(retries) - len(retried)
+        claimed += retried
+
+        # No transaction is open while sending; outcomes are written together afterwards
+        sent, failed = [], []
+        for reminder_id, row, recipient in claimed:
+            self.limiter.acquire()
+            try:
+                self.sender.send(self._message(row, recipient))
+                sent.append(reminder_id)
+            except Exception as e:
+                self.app.logger.exception('Sending reminder for vehicle %s failed', row.id)
+                failed.append((reminder_id, str(e)))
+        if sent:
+            db.session.execute(update(ServiceReminder).where(ServiceReminder.id.in_(sent))
+                               .values(status='sent', sent_at=datetime.utcnow()))
+        for reminder_id, error in failed:
+            db.session.execute(update(ServiceReminder).where(ServiceReminder.id == reminder_id)
+                               .values(status='failed', error=error))
+        counts['sent'] = len(sent)
+        counts['failed'] = len(failed)
+        db.session.commit()
+        return counts
+
+    def _retryable(self, reminder, now):
+        """A previous reminder that failed, or whose claim was abandoned, may be sent again"""
+        if reminder.status == 'failed':
+            return True
+        claimed_at = reminder.claimed_at or reminder.created_at
+        return reminder.status == 'pending' and claimed_at is not None and claimed_at < now - self.pending_timeout
+
+    def _retryable_condition(self, now):
+        # The SQL form of _retryable(); rows claimed before claimed_at existed fall back to created_at
+        return or_(
+            ServiceReminder.status == 'failed',
+            and_(ServiceReminder.status == 'pending',
+                 func.coalesce(ServiceReminder.claimed_at, ServiceReminder.created_at) < now - self.pending_timeout),
+        )
+
+    def _message(self, row, recipient):
+        due = row.next_service_date.strftime('%d %b %Y')
+        vehicle = f'{row.model} ({row.license_plate})'
+        return {
+            'channel': self.channel,
+            'to': recipient,
+            'subject': f'Service reminder for {vehicle}',
+            'body': f'Hi {row.name}, your {vehicle} is due for service on {due}. Book a slot from your dashboard.',
+            'vehicle_id': row.id,
+            'due_date': row.next_service_date.isoformat(),
+        }
+
+    def _checkpoint_key(self):
+        return f'{self.channel}:{self.window[1].date().isoformat()}'
+
+    def _load_checkpoint(self):
+        # Only a checkpoint left by an unfinished run for the same channel and day is resumed
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return checkpoint['cursor'] if checkpoint.get('key') == self._checkpoint_key() else None
+
+    def _save_checkpoint(self, cursor):
+        if self.checkpoint_path:
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            with open(self.checkpoint_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': self._checkpoint_key(), 'cursor': cursor}, f)
+
+    def _clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def send_due_reminders(app, restart=False, **overrides):
+    """Run the reminder job with the app's REMINDER_* settings; overrides take precedence"""
+    options = {
+        'channel': app.config['REMINDER_CHANNEL'],
+        'lead_days': app.config['REMINDER_LEAD_DAYS'],
+        'lookback_days': app.config['REMINDER_LOOKBACK_DAYS'],
+        'batch_size': app.config['REMINDER_BATCH_SIZE'],
+        'rate': app.config['REMINDER_RATE'],
+        'pending_timeout_minutes': app.config['REMINDER_PENDING_TIMEOUT_MINUTES'],
+        'checkpoint_path': os.path.join(app.instance_path, 'reminders.checkpoint.json'),
+    }
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    return ReminderJob(app, load_sender(app), **options).run(restart=restart)
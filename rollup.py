@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, insert, inspect, select, type_coerce
+from models import db, Service, Payment, ServiceDailyRollup
+
+# Service and Payment attributes that move a service between rollup rows or change its figures
+_SERVICE_FIELDS = ('scheduled_date', 'service_type', 'status', 'cost')
+_PAYMENT_FIELDS = ('service_id', 'amount', 'status')
+
+# Days recomputed per statement pair; keeps the IN list well inside SQLite's bound-parameter limit
+REFRESH_BATCH_DAYS = 500
+
+_installed = False
+
+
+def init_app(app):
+    """Keep service_daily_rollup current from every ORM flush that touches a Service or Payment.
+
+    Bulk UPDATE/DELETE statements bypass the flush, so code issuing them calls
+    service_days() beforehand and refresh_days() afterwards.
+    """
+    global _installed
+    if not _installed:
+        event.listen(db.session, 'after_flush', _after_flush)
+        _installed = True
+
+
+def service_days(condition, connection=None):
+    """Distinct scheduled days of the services matching condition"""
+    connection = connection or db.session
+    stamps = connection.execute(select(Service.scheduled_date).where(condition, Service.scheduled_date.isnot(None))).scalars()
+    return {_day_of(stamp) for stamp in stamps}
+
+
+def refresh_days(days, connection=None):
+    """Recompute the rollup rows of the given days from services and completed payments.
+
+    Days are replaced in sorted batches, each with a delete and an insert-from-select
+    over the batch's range of ix_service_scheduled_date_id filtered to its days, so the
+    statement size stays fixed however many days a purge or closure touches.
+    """
+    days = sorted(set(days))
+    connection = connection or db.session
+    for first in range(0, len(days), REFRESH_BATCH_DAYS):
+        batch = days[first:first + REFRESH_BATCH_DAYS]
+        connection.execute(delete(ServiceDailyRollup).where(ServiceDailyRollup.day.in_(batch)))
+        connection.execute(_rebuild_from(_on_days(batch)))
+
+
+def rebuild():
+    """Recompute the whole table; the caller commits"""
+    db.session.execute(delete(ServiceDailyRollup))
+    db.session.execute(_rebuild_from(Service.scheduled_date.isnot(None)))
+    return db.session.query(func.count()).select_from(ServiceDailyRollup).scalar()
+
+
+def report(start, end):
+    """Rollup rows for scheduled days in [start, end], ordered by day"""
+    return (ServiceDailyRollup.query
+            .filter(ServiceDailyRollup.day.between(start, end))
+            .order_by(ServiceDailyRollup.day, ServiceDailyRollup.service_type, ServiceDailyRollup.status)
+            .all())
+
+
+def _on_days(days):
+    # The range lets the scheduled_date index narrow the scan; the IN keeps only the listed days within it
+    start = datetime.combine(days[0], datetime.min.time())
+    end = datetime.combine(days[-1], datetime.min.time()) + timedelta(days=1)
+    return ((Service.scheduled_date >= start) & (Service.scheduled_date < end)
+            & type_coerce(func.date(Service.scheduled_date), db.Date).in_(days))
+
+
+def _rebuild_from(condition):
+    paid = (select(func.coalesce(func.sum(Payment.amount), 0))
+            .where(Payment.service_id == Service.id, Payment.status == 'completed')
+            .scalar_subquery())
+    per_service = select(
+        type_coerce(func.date(Service.scheduled_date), db.Date).label('day'),
+        func.coalesce(Service.service_type, '').label('service_type'),
+        func.coalesce(Service.status, '').label('status'),
+        func.coalesce(Service.cost, 0).label('cost'),
+        paid.label('paid'),
+    ).where(condition).subquery()
+    grouped = (select(per_service.c.day, per_service.c.service_type, per_service.c.status,
+                      func.count(), func.sum(per_service.c.cost), func.sum(per_service.c.paid))
+               .group_by(per_service.c.day, per_service.c.service_type, per_service.c.status))
+    return insert(ServiceDailyRollup).from_select(
+        ['day', 'service_type', 'status', 'service_count', 'total_cost', 'paid_amount'], grouped
+    )
+
+
+def _after_flush(session, flush_context):
+    days = set()
+    payment_services = set()
+    for obj, is_deleted in [(o, False) for o in session.new] + [(o, False) for o in session.dirty] + [(o, True) for o in session.deleted]:
+        if isinstance(obj, Service):
+            state = inspect(obj)
+            if not (is_deleted or obj in session.new) and not _changed(state, _SERVICE_FIELDS):
+                continue
+            # Old and new day alike: a rescheduled service leaves one day and joins another
+            for stamp in state.attrs.scheduled_date.history.sum():
+                if stamp is not None:
+                    days.add(_day_of(stamp))
+        elif isinstance(obj, Payment):
+            state = inspect(obj)
+            if not (is_deleted or obj in session.new) and not _changed(state, _PAYMENT_FIELDS):
+                continue
+            payment_services.update(i for i in state.attrs.service_id.history.sum() if i is not None)
+    if not days and not payment_services:
+        return
+    # Core statements on the flush's own connection: the session must not be used mid-flush
+    connection = session.connection()
+    if payment_services:
+        days |= service_days(Service.id.in_(payment_services), connection)
+    refresh_days(days, connection)
+
+
+def _day_of(stamp):
+    return stamp.date() if isinstance(stamp, datetime) else stamp
+
+
+def _changed(state, fields):
+    return any(state.attrs[field].history.has_changes() for field in fields)
@@ -1,14 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from models import db, Vehicle, User, Service, Admin, ServiceHistory, Payment, BookingSlot, SlotBooking, SlotSettings, NonWorkingDay
 from datetime import datetime, timedelta, date
 import json
+import hashlib
 from dateutil.relativedelta import relativedelta
 from flask_login import login_user, LoginManager, login_required, logout_user, current_user
 from forms import LoginForm, CustomerRegisterForm, AdminRegisterForm, VehicleForm, ServiceForm, ServiceUpdateForm, PaymentForm, ServiceFilterForm
-from flask_bcrypt import Bcrypt
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from pagination import PER_PAGE, decode_cursor, keyset_paginate
+from stats import dashboard_stats, invalidate_dashboard_stats
+from scheduling import DEFAULT_SLOT_TIMES, MAX_CLOSURE_DAYS, slot_settings, holiday_calendar, close_days
+from identity import load_identity, forget_identity
+from instrumentation import metrics
+from dbpool import pool_metrics
+from purge import purge_user, purge_vehicle
+from exports import FORMATS, services_export, bookings_export, stream_rows
+from passwords import passwords
+from assets import assets
+from forecast import due_list
+from rollup import report as rollup_report
+from analytics import turnaround_report
+from search import search, MAX_RESULTS
 
 app = Flask(__name__)
-bcrypt = Bcrypt(app)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -20,7 +35,7 @@ def is_admin(user):
 
 @app.route('/',methods=['GET','POST'])
 def landing_page():
-    return send_from_directory('landing-page', 'index.html')
+    return assets.send('', 'index.html')
 
 @app.route('/select_user',methods=['GET','POST'])
 def select_user():
@@ -32,7 +47,10 @@ def login_customer():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user:
-            if bcrypt.check_password_hash(user.password, form.password.data):
+            if passwords.verify(user.password, form.password.data):
+                if passwords.upgrade(user, form.password.data):
+                    db.session.commit()
+                    forget_identity(user)
                 login_user(user)
                 flash("Login successful!", "success")
                 return redirect(url_for('customer_dashboard'))
@@ -48,7 +66,10 @@ def login_admin():
     if form.validate_on_submit():
         user = Admin.query.filter_by(email=form.email.data).first()
         if user:
-            if bcrypt.check_password_hash(user.password, form.password.data):
+            if passwords.verify(user.password, form.password.data):
+                if passwords.upgrade(user, form.password.data):
+                    db.session.commit()
+                    forget_identity(user)
                 login_user(user)
                 flash("Login successful!", "success")
                 return redirect(url_for('dashboard_admin'))
@@ -98,6 +119,7 @@ def dashboard_admin():
         
         db.session.add(history)
         db.session.commit()
+        invalidate_dashboard_stats()
         
         flash('Service updated successfully!', 'success')
         return redirect(url_for('dashboard_admin'))
@@ -115,8 +137,9 @@ def view_vehicles():
         
         # Admin sees all vehicles
         if isinstance(current_user, Admin):
-            vehicles = Vehicle.query.all()
-            return render_template('admin/vehicles.html', vehicles=vehicles)
+            cursor, per_page = _page_args()
+            page = keyset_paginate(Vehicle.query, Vehicle.id, cursor=cursor, per_page=per_page)
+            return render_template('admin/vehicles.html', vehicles=page.items, page=page)
         
         # Customer sees only their vehicles
         # Get the real user ID (integer)
@@ -150,15 +173,11 @@ def view_vehicles():
 def view_services():
     # Redirect admin users to admin view
     if isinstance(current_user, Admin):
-        services = Service.query.order_by(Service.scheduled_date).all()
-        return render_template('admin/services.html', services=services)
+        form, page = _service_page(Service.query)
+        return render_template('admin/services.html', services=page.items, page=page, form=form)
     # For regular users, show their services using the real database ID
     user_id = current_user.real_id if hasattr(current_user, 'real_id') else current_user.id
     services = Service.query.filter_by(user_id=user_id).order_by(Service.scheduled_date).all()
-    # Add debugging info
-    print(f"Customer ID: {user_id}, Found {len(services)} services")
-    for service in services:
-        print(f"Service ID: {service.id}, Status: {service.status}, Type: {service.service_type}")
     return render_template('customer/services.html', services=services)
 
 @app.route('/service_history')
@@ -166,8 +185,8 @@ def view_services():
 def service_history():
     # Redirect admin users to admin view
     if isinstance(current_user, Admin):
-        services = Service.query.order_by(Service.scheduled_date.desc()).all()
-        return render_template('admin/history.html', services=services)
+        form, page = _service_page(Service.query, descending=True)
+        return render_template('admin/history.html', services=page.items, page=page, form=form)
     # For regular users, show their service history
     services = Service.query.filter_by(user_id=current_user.real_id).order_by(Service.scheduled_date.desc()).all()
     return render_template('customer/history.html', services=services)
@@ -177,8 +196,8 @@ def service_history():
 def view_payments():
     # Redirect admin users to admin view
     if isinstance(current_user, Admin):
-        services = Service.query.filter(Service.cost.isnot(None)).order_by(Service.scheduled_date.desc()).all()
-        return render_template('admin/payments.html', services=services)
+        form, page = _service_page(Service.query.filter(Service.cost.isnot(None)), descending=True)
+        return render_template('admin/payments.html', services=page.items, page=page, form=form)
     # For regular users, show their payments
     services = Service.query.filter_by(user_id=current_user.real_id).filter(Service.cost.isnot(None)).order_by(Service.scheduled_date.desc()).all()
     return render_template('customer/payments.html', services=services)
@@ -224,6 +243,7 @@ def service_details(service_id):
         
         db.session.add(history)
         db.session.commit()
+        invalidate_dashboard_stats()
         
         flash('Service updated successfully!', 'success')
         return redirect(url_for('service_details', service_id=service_id))
@@ -241,11 +261,15 @@ def delete_vehicle(vehicle_id):
         flash('You do not have permission to delete this vehicle.', 'danger')
         return redirect(url_for('view_vehicles'))
     try:
-        db.session.delete(vehicle_to_delete)
+        # Bookings, services, payments and history go with the vehicle, all in one transaction
+        db.session.expunge(vehicle_to_delete)
+        purge_vehicle(vehicle_id)
         db.session.commit()
+        invalidate_dashboard_stats()
         flash('Vehicle deleted successfully!', 'success')
         return redirect(url_for('view_vehicles'))
-    except:
+    except Exception:
+        db.session.rollback()
         flash('There was an error deleting the vehicle.', 'danger')
         return redirect(url_for('view_vehicles'))
 
@@ -296,6 +320,7 @@ def update_user_details():
             user.address = request.form['address']
             
             db.session.commit()
+            forget_identity(user)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('customer_dashboard'))
         except Exception as e:
@@ -349,36 +374,56 @@ def admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def _page_args():
+    """Read the keyset cursor ('after') and page size from the query string, ignoring a malformed cursor"""
+    cursor = request.args.get('after') or None
+    per_page = request.args.get('per_page', PER_PAGE, type=int)
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            cursor = None
+    return cursor, per_page
+
+def _service_page(query, descending=False):
+    """Apply the ServiceFilterForm choices from the query string in SQL and return (form, page) ordered by scheduled date"""
+    form = ServiceFilterForm(request.args, meta={'csrf': False})
+    if form.status.data and form.status.data != 'all':
+        query = query.filter(Service.status == form.status.data)
+    if form.service_type.data and form.service_type.data != 'all':
+        query = query.filter(Service.service_type == form.service_type.data)
+    cursor, per_page = _page_args()
+    page = keyset_paginate(query, Service.id, Service.scheduled_date, cursor, per_page, descending)
+    return form, page
+
 @app.route('/admin/dashboard')
 @login_required
 @admin_required
 def admin_dashboard():
-    total_vehicles = Vehicle.query.count()
-    total_services = Service.query.count()
-    pending_services = Service.query.filter_by(status='scheduled').count()
-    completed_services = Service.query.filter_by(status='completed').count()
+    stats = dashboard_stats()
     
     return render_template('admin/dashboard.html',
-                         total_vehicles=total_vehicles,
-                         total_services=total_services,
-                         pending_services=pending_services,
-                         completed_services=completed_services)
+                         total_vehicles=stats['total_vehicles'],
+                         total_services=stats['total_services'],
+                         pending_services=stats['pending_services'],
+                         completed_services=stats['completed_services'],
+                         stats=stats)
 
 @app.route('/admin/vehicles')
 @login_required
 @admin_required
 def admin_vehicles():
     form = ServiceFilterForm()
-    vehicles = Vehicle.query.all()
-    return render_template('admin/vehicles.html', vehicles=vehicles, form=form)
+    cursor, per_page = _page_args()
+    page = keyset_paginate(Vehicle.query, Vehicle.id, cursor=cursor, per_page=per_page)
+    return render_template('admin/vehicles.html', vehicles=page.items, page=page, form=form)
 
 @app.route('/admin/services')
 @login_required
 @admin_required
 def admin_services():
-    form = ServiceFilterForm()
-    services = Service.query.order_by(Service.scheduled_date).all()
-    return render_template('admin/services.html', services=services, form=form)
+    form, page = _service_page(Service.query)
+    return render_template('admin/services.html', services=page.items, page=page, form=form)
 
 @app.route('/admin/service/<int:service_id>', methods=['GET', 'POST'])
 @login_required
@@ -405,9 +450,10 @@ def admin_service_details(service_id):
         )
         db.session.add(history)
         db.session.commit()
+        invalidate_dashboard_stats()
         
         flash('Service updated successfully!', 'success')
-        return redirect(url_for('main.admin_service_details', service_id=service_id))
+        return redirect(url_for('admin_service_details', service_id=service_id))
     
     return render_template('admin/service_details.html', service=service, form=form)
 
@@ -415,40 +461,25 @@ def admin_service_details(service_id):
 @login_required
 @admin_required
 def admin_reports():
-    form = ServiceFilterForm()
-    services = Service.query.order_by(Service.scheduled_date).all()
-    return render_template('admin/reports.html', services=services, form=form)
+    form, page = _service_page(Service.query)
+    # Daily per type/status totals from the rollup table, for the last year unless a range is given
+    try:
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else date.today()
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else end - timedelta(days=365)
+    except ValueError:
+        flash('Invalid date format. Use YYYY-MM-DD', 'danger')
+        end = date.today()
+        start = end - timedelta(days=365)
+    return render_template('admin/reports.html', services=page.items, page=page, form=form,
+                           rollup=rollup_report(start, end), start_date=start, end_date=end)
 
 @login_manager.user_loader
 def load_user(user_id):
+    # Runs on every authenticated request; repeat visits are served from the identity cache
     try:
-        print(f"DEBUG: Loading user with ID: {user_id}")
-        # Check if the ID has a prefix to identify the user type
-        if user_id.startswith('admin_'):
-            admin_id = int(user_id.replace('admin_', ''))
-            admin = Admin.query.get(admin_id)
-            print(f"DEBUG: Loaded admin: {admin}")
-            return admin
-        elif user_id.startswith('user_'):
-            user_real_id = int(user_id.replace('user_', ''))
-            user = User.query.get(user_real_id)
-            print(f"DEBUG: Loaded user: {user}")
-            return user
-        else:
-            # For backward compatibility, try both (but this shouldn't happen with the new system)
-            print(f"DEBUG: Trying backward compatibility for ID: {user_id}")
-            user = User.query.get(int(user_id))
-            if user:
-                print(f"DEBUG: Found user via backward compatibility: {user}")
-                return user
-            admin = Admin.query.get(int(user_id))
-            if admin:
-                print(f"DEBUG: Found admin via backward compatibility: {admin}")
-                return admin
-    except Exception as e:
-        print(f"ERROR in user_loader: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        return load_identity(user_id)
+    except Exception:
+        app.logger.exception('Failed to load user %s', user_id)
     return None
 
 @app.route('/logout', methods=['GET', 'POST'])
@@ -467,12 +498,13 @@ def customer_register():
         if existing_email:
             flash("This email is already registered.", "danger")
             return redirect(url_for('register'))
-        hashed_password = bcrypt.generate_password_hash(form.password.data)
+        hashed_password = passwords.hash(form.password.data)
         new_user = User(email=form.email.data, password=hashed_password,
                         name=form.name.data, phone=form.phone.data,
                         address=form.address.data)
         db.session.add(new_user)
         db.session.commit()
+        forget_identity(new_user)
         flash("Account created successfully!", "success")
         return redirect(url_for('login_customer'))
 
@@ -487,11 +519,12 @@ def register_admin():
         if existing_email:
             flash("This email is already registered.", "danger")
             return redirect(url_for('admin_register'))
-        hashed_password = bcrypt.generate_password_hash(form.password.data)
+        hashed_password = passwords.hash(form.password.data)
         new_admin = Admin(email=form.email.data, password=hashed_password,
                         name=form.name.data)
         db.session.add(new_admin)
         db.session.commit()
+        forget_identity(new_admin)
         flash("Account created successfully!", "success")
         return redirect(url_for('login_admin'))
 
@@ -554,6 +587,7 @@ def cancel_service(service_id):
     
     db.session.add(history)
     db.session.commit()
+    invalidate_dashboard_stats()
     
     flash('Service cancelled successfully!', 'success')
     return redirect(url_for('view_services'))
@@ -566,19 +600,14 @@ def delete_account():
         return redirect(url_for('customer_dashboard'))
     
     try:
-        # Delete all vehicles associated with the user
-        vehicles = Vehicle.query.filter_by(user_id=current_user.real_id).all()
-        for vehicle in vehicles:
-            db.session.delete(vehicle)
-        
-        # Delete all services associated with the user
-        services = Service.query.filter_by(user_id=current_user.real_id).all()
-        for service in services:
-            db.session.delete(service)
-        
-        # Delete the user account
-        db.session.delete(current_user)
+        # Delete the account with its vehicles, services, payments, history and bookings using set-based
+        # statements in one transaction, releasing the slot places its confirmed bookings held
+        account = current_user._get_current_object()
+        db.session.expunge(account)
+        purge_user(account.id)
         db.session.commit()
+        forget_identity(account)
+        invalidate_dashboard_stats()
         
         logout_user()
         flash('Your account has been successfully deleted.', 'success')
@@ -622,6 +651,7 @@ def modify_service(service_id):
             
             db.session.add(history)
             db.session.commit()
+            invalidate_dashboard_stats()
             
             flash('Service updated successfully!', 'success')
             return redirect(url_for('view_services'))
@@ -673,6 +703,7 @@ def make_payment(service_id):
                 db.session.add(payment)
             
             db.session.commit()
+            invalidate_dashboard_stats()
             flash('Payment processed successfully!', 'success')
             return redirect(url_for('service_details', service_id=service_id))
         except Exception as e:
@@ -698,21 +729,59 @@ def admin_payment_details(service_id):
         return redirect(url_for('admin_payments'))
     return render_template('admin/payment_details.html', service=service)
 
-# Routes to serve static files from landing-page directory
+# Routes to serve static files from landing-page directory (ETag, Cache-Control and gzip handled by assets)
 @app.route('/css/<path:filename>')
 def landing_css(filename):
-    return send_from_directory('landing-page/css', filename)
+    return assets.send('css', filename)
 
 @app.route('/js/<path:filename>')
 def landing_js(filename):
-    return send_from_directory('landing-page/js', filename)
+    return assets.send('js', filename)
 
 @app.route('/images/<path:filename>')
 def landing_images(filename):
-    return send_from_directory('landing-page/images', filename)
+    return assets.send('images', filename)
 
 # ==================== CALENDAR SLOT BOOKING SYSTEM ====================
 
+def _materialize_slots(target_date, slot_times, max_bookings):
+    """Return the slots for a date keyed by time, creating any missing ones in one insert and one commit"""
+    slots = {slot.time: slot for slot in BookingSlot.query.filter_by(date=target_date).all()}
+    missing = [time_slot for time_slot in dict.fromkeys(slot_times) if time_slot not in slots]
+    if not missing:
+        return slots
+
+    try:
+        # One executemany; added as ORM objects each row would be inserted with its own RETURNING statement
+        db.session.execute(db.insert(BookingSlot), [
+            {
+                'date': target_date,
+                'time': time_slot,
+                'max_bookings': max_bookings,
+                'current_bookings': 0,
+                'is_available': True
+            }
+            for time_slot in missing
+        ])
+        db.session.commit()
+    except IntegrityError:
+        # Another request created the same slots first; the unique (date, time) index kept them single
+        db.session.rollback()
+    # One reload refreshes every slot for the date, including the rows just inserted
+    return {slot.time: slot for slot in BookingSlot.query.filter_by(date=target_date).all()}
+
+def _slot_etag(target_date, reason, config, slot_count=0, last_change=None):
+    """Version of a date's availability: its closure, the settings snapshot, and its slots' latest updated_at"""
+    key = (target_date.isoformat(), reason, config.slot_times, config.version, slot_count, last_change)
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+def _slot_response(payload, etag):
+    # Clients may reuse the body but must revalidate it on every use
+    response = jsonify(payload) if payload is not None else app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # API endpoint to get available slots for a specific date
 @app.route('/api/slots/<string:date_str>')
 @api_login_required
@@ -720,57 +789,32 @@ def get_available_slots(date_str):
     try:
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        # Check if it's a weekend
-        if target_date.weekday() in [5, 6]:  # Saturday = 5, Sunday = 6
-            return jsonify({'available': False, 'reason': 'Weekend - No bookings available'}), 200
-        
-        # Check if it's a non-working day
-        non_working = NonWorkingDay.query.filter_by(date=target_date).first()
-        if non_working:
-            return jsonify({'available': False, 'reason': non_working.reason or 'Non-working day'}), 200
+        # Weekends, non-working days and recurring holidays, answered from the in-memory calendar
+        reason = holiday_calendar.get().closure_reason(target_date)
+        # Parsed settings snapshot; no settings query on the request path
+        config = slot_settings.get()
+        if reason:
+            etag = _slot_etag(target_date, reason, config)
+            if request.if_none_match.contains(etag):
+                return _slot_response(None, etag)
+            return _slot_response({'available': False, 'reason': reason}, etag), 200
         
-        # Get slot settings, create defaults if not found
-        settings = SlotSettings.query.first()
-        if not settings:
-            # Create default settings
-            default_times = ['09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM']
-            settings = SlotSettings(
-                default_slots_per_day=5,
-                slot_times=json.dumps(default_times),
-                max_bookings_per_slot=1,
-                booking_advance_days=30,
-                updated_at=datetime.utcnow()
-            )
-            db.session.add(settings)
-            db.session.commit()
+        # Answer a revalidation from one aggregate over the date's slots, before building anything
+        if request.if_none_match:
+            slot_count, last_change = db.session.query(
+                func.count(BookingSlot.id), func.max(BookingSlot.updated_at)
+            ).filter(BookingSlot.date == target_date).one()
+            etag = _slot_etag(target_date, None, config, slot_count, last_change)
+            if request.if_none_match.contains(etag):
+                return _slot_response(None, etag)
         
-        # Parse slot times safely
-        try:
-            slot_times = json.loads(settings.slot_times) if settings.slot_times else ['09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM']
-        except json.JSONDecodeError:
-            slot_times = ['09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM']
+        slot_times = list(config.slot_times)
         
         # Get or create slots for this date
+        slots = _materialize_slots(target_date, slot_times, config.max_bookings_per_slot)
         slots_data = []
         for time_slot in slot_times:
-            slot = BookingSlot.query.filter_by(date=target_date, time=time_slot).first()
-            
-            if not slot:
-                # Create slot if it doesn't exist
-                slot = BookingSlot(
-                    date=target_date,
-                    time=time_slot,
-                    max_bookings=settings.max_bookings_per_slot or 1,
-                    current_bookings=0,
-                    is_available=True
-                )
-                db.session.add(slot)
-                
-            try:
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
-            
+            slot = slots[time_slot]
             slots_data.append({
                 'id': slot.id,
                 'time': slot.time or time_slot,
@@ -779,11 +823,13 @@ def get_available_slots(date_str):
                 'max_bookings': slot.max_bookings or 1
             })
         
-        return jsonify({
+        changes = [slot.updated_at for slot in slots.values() if slot.updated_at is not None]
+        etag = _slot_etag(target_date, None, config, len(slots), max(changes) if changes else None)
+        return _slot_response({
             'available': True,
             'date': date_str,
             'slots': slots_data
-        }), 200
+        }, etag), 200
         
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
@@ -795,6 +841,69 @@ def get_available_slots(date_str):
             'reason': 'Service temporarily unavailable'
         }), 500
 
+# API endpoint to get availability for a window of dates in one request
+@app.route('/api/slots')
+@api_login_required
+def get_slot_range():
+    try:
+        config = slot_settings.get()
+        slot_times = list(config.slot_times)
+        max_bookings = config.max_bookings_per_slot
+        advance_days = config.booking_advance_days
+        
+        # Past days are never bookable and nothing beyond the advance window may be booked
+        today = date.today()
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        start = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+        end = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else today + timedelta(days=advance_days)
+        start = max(start, today)
+        end = min(end, today + timedelta(days=advance_days))
+        if end < start:
+            return jsonify({'error': 'The requested range is outside the booking window'}), 400
+        
+        # A single slot query; settings and holidays come from the in-memory snapshots
+        closures = holiday_calendar.get().closures(start, end)
+        slots = {}
+        for slot in BookingSlot.query.filter(BookingSlot.date.between(start, end)).all():
+            slots[(slot.date, slot.time)] = slot
+        
+        days_data = []
+        current = start
+        while current <= end:
+            reason = closures.get(current)
+            if reason:
+                days_data.append({'date': current.strftime('%Y-%m-%d'), 'available': False, 'reason': reason})
+            else:
+                # Free places per slot time, in the same order as the top-level 'times' list
+                free = []
+                for time_slot in slot_times:
+                    slot = slots.get((current, time_slot))
+                    if slot is None:
+                        free.append(max_bookings)
+                    elif slot.is_available is False:
+                        free.append(0)
+                    else:
+                        free.append(max(0, (slot.max_bookings or 1) - (slot.current_bookings or 0)))
+                days_data.append({'date': current.strftime('%Y-%m-%d'), 'available': any(free), 'free': free})
+            current += timedelta(days=1)
+        
+        return jsonify({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'times': slot_times,
+            'days': days_data
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({
+            'error': f'Server error: {str(e)}',
+            'available': False,
+            'reason': 'Service temporarily unavailable'
+        }), 500
+
 # Book a slot
 @app.route('/api/book_slot', methods=['POST'])
 @api_login_required
@@ -806,49 +915,67 @@ def book_slot():
         service_type = data.get('service_type')
         notes = data.get('notes', '')
         
+        user_id = current_user.real_id if hasattr(current_user, 'real_id') else current_user.id
+        
         # Validate slot
         slot = BookingSlot.query.get(slot_id)
         if not slot:
             return jsonify({'error': 'Invalid slot'}), 400
+        scheduled_date = datetime.combine(slot.date, datetime.strptime(slot.time, '%I:%M %p').time())
         
-        if slot.is_fully_booked():
+        # Claim a place with a conditional update so concurrent requests can never overbook the slot
+        claimed = db.session.execute(
+            db.update(BookingSlot)
+            .where(
+                BookingSlot.id == slot.id,
+                BookingSlot.current_bookings < BookingSlot.max_bookings,
+                BookingSlot.is_available.isnot(False)
+            )
+            .values(current_bookings=BookingSlot.current_bookings + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            db.session.rollback()
+            if slot.is_available is False:
+                return jsonify({'error': 'Slot is not available'}), 400
             return jsonify({'error': 'Slot is fully booked'}), 400
         
-        # Create booking
-        booking = SlotBooking(
-            slot_id=slot_id,
-            user_id=current_user.real_id if hasattr(current_user, 'real_id') else current_user.id,
-            vehicle_id=vehicle_id,
-            service_type=service_type,
-            notes=notes
-        )
-        
-        # Update slot bookings count
-        slot.current_bookings += 1
-        
-        db.session.add(booking)
-        db.session.commit()
-        
-        # Create service record
+        # Create the service record and the booking in the same transaction as the claim
         service = Service(
             service_type=service_type,
-            scheduled_date=datetime.combine(slot.date, datetime.strptime(slot.time, '%I:%M %p').time()),
+            scheduled_date=scheduled_date,
             status='scheduled',
             vehicle_id=vehicle_id,
-            user_id=current_user.real_id if hasattr(current_user, 'real_id') else current_user.id,
+            user_id=user_id,
             notes=notes
         )
         db.session.add(service)
-        db.session.commit()
+        db.session.flush()
+        # Opens the service's history so turnaround analytics can measure time spent scheduled
+        db.session.add(ServiceHistory(
+            service_id=service.id,
+            status='scheduled',
+            notes=f'Booked for {slot.date.strftime("%Y-%m-%d")} {slot.time}'
+        ))
         
-        # Link service to booking
-        booking.service_id = service.id
+        booking = SlotBooking(
+            slot_id=slot.id,
+            service_id=service.id,
+            user_id=user_id,
+            vehicle_id=vehicle_id,
+            service_type=service_type,
+            notes=notes
+        )
+        db.session.add(booking)
+        db.session.flush()
+        booking_id, service_id = booking.id, service.id
         db.session.commit()
+        invalidate_dashboard_stats()
         
         return jsonify({
             'success': True,
-            'booking_id': booking.id,
-            'service_id': service.id,
+            'booking_id': booking_id,
+            'service_id': service_id,
             'message': 'Slot booked successfully!'
         }), 200
         
@@ -866,7 +993,14 @@ def get_all_bookings():
         start_date = request.args.get('start')
         end_date = request.args.get('end')
         
-        query = SlotBooking.query.join(BookingSlot).join(User).join(Vehicle)
+        # Load the slot, customer and vehicle from the same joined rows instead of one lazy SELECT each per booking
+        query = (SlotBooking.query
+                 .join(SlotBooking.slot)
+                 .join(SlotBooking.user)
+                 .join(SlotBooking.vehicle)
+                 .options(db.contains_eager(SlotBooking.slot),
+                          db.contains_eager(SlotBooking.user),
+                          db.contains_eager(SlotBooking.vehicle)))
         
         if start_date:
             start = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -903,35 +1037,20 @@ def get_all_bookings():
 def manage_slot_settings():
     try:
         if request.method == 'GET':
-            settings = SlotSettings.query.first()
-            if settings:
-                slot_times_list = []
-                if settings.slot_times:
-                    try:
-                        slot_times_list = json.loads(settings.slot_times)
-                    except json.JSONDecodeError:
-                        slot_times_list = ['09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM']
-                
-                return jsonify({
-                    'default_slots_per_day': settings.default_slots_per_day or 5,
-                    'slot_times': slot_times_list,
-                    'max_bookings_per_slot': settings.max_bookings_per_slot or 1,
-                    'booking_advance_days': settings.booking_advance_days or 30
-                }), 200
-            return jsonify({'error': 'Settings not found'}), 404
+            return jsonify(slot_settings.get().to_dict()), 200
         
         elif request.method == 'POST':
             data = request.json
             if not data:
                 return jsonify({'error': 'No data provided'}), 400
                 
-            settings = SlotSettings.query.first()
+            settings = SlotSettings.query.order_by(SlotSettings.id).first()
             
             if not settings:
                 # Create new settings with defaults
                 settings = SlotSettings(
-                    default_slots_per_day=5,
-                    slot_times=json.dumps(['09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM']),
+                    default_slots_per_day=len(DEFAULT_SLOT_TIMES),
+                    slot_times=json.dumps(list(DEFAULT_SLOT_TIMES)),
                     max_bookings_per_slot=1,
                     booking_advance_days=30,
                     updated_at=datetime.utcnow()
@@ -953,6 +1072,7 @@ def manage_slot_settings():
             
             try:
                 db.session.commit()
+                slot_settings.refresh(settings)
                 return jsonify({'success': True, 'message': 'Settings updated successfully'}), 200
             except Exception as commit_error:
                 db.session.rollback()
@@ -981,34 +1101,36 @@ def manage_non_working_days():
         
         elif request.method == 'POST':
             data = request.json
-            target_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            
-            # Check if already exists
-            existing = NonWorkingDay.query.filter_by(date=target_date).first()
-            if existing:
-                return jsonify({'error': 'This date is already marked as non-working'}), 400
+            # Either a single 'date' or an inclusive 'start_date'..'end_date' range
+            if data.get('start_date'):
+                start = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+                end = datetime.strptime(data.get('end_date') or data['start_date'], '%Y-%m-%d').date()
+            else:
+                start = end = datetime.strptime(data['date'], '%Y-%m-%d').date()
+            if end < start:
+                return jsonify({'error': 'End date must not be before start date'}), 400
+            if (end - start).days >= MAX_CLOSURE_DAYS:
+                return jsonify({'error': f'A closure can cover at most {MAX_CLOSURE_DAYS} days'}), 400
             
-            non_working = NonWorkingDay(
-                date=target_date,
+            # Add the days and cancel their bookings, linked services and slot capacity in one transaction
+            result = close_days(
+                start,
+                end,
                 reason=data.get('reason', 'Holiday'),
                 is_recurring=data.get('is_recurring', False),
                 created_by=current_user.real_id if hasattr(current_user, 'real_id') else current_user.id
             )
-            
-            db.session.add(non_working)
-            db.session.commit()
-            
-            # Cancel all bookings for this date
-            slots = BookingSlot.query.filter_by(date=target_date).all()
-            for slot in slots:
-                slot.is_available = False
-                bookings = SlotBooking.query.filter_by(slot_id=slot.id, status='confirmed').all()
-                for booking in bookings:
-                    booking.status = 'cancelled'
+            if not result['days_added']:
+                db.session.rollback()
+                message = 'This date is already marked as non-working' if start == end else 'These dates are already marked as non-working'
+                return jsonify({'error': message}), 400
             
             db.session.commit()
+            holiday_calendar.refresh()
+            invalidate_dashboard_stats()
             
-            return jsonify({'success': True, 'message': 'Non-working day added successfully'}), 200
+            message = 'Non-working day added successfully' if start == end else 'Non-working days added successfully'
+            return jsonify({'success': True, 'message': message, **result}), 200
         
         elif request.method == 'DELETE':
             day_id = request.args.get('id')
@@ -1018,16 +1140,24 @@ def manage_non_working_days():
                 return jsonify({'error': 'Non-working day not found'}), 404
             
             # Re-enable slots for this date
-            slots = BookingSlot.query.filter_by(date=non_working.date).all()
-            for slot in slots:
-                slot.is_available = True
+            db.session.execute(
+                db.update(BookingSlot)
+                .where(BookingSlot.date == non_working.date)
+                .values(is_available=True)
+                .execution_options(synchronize_session=False)
+            )
             
             db.session.delete(non_working)
             db.session.commit()
+            holiday_calendar.refresh()
             
             return jsonify({'success': True, 'message': 'Non-working day removed successfully'}), 200
             
+    except ValueError:
+        db.session.rollback()
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # Get user's bookings
@@ -1036,7 +1166,11 @@ def manage_non_working_days():
 def get_my_bookings():
     try:
         user_id = current_user.real_id if hasattr(current_user, 'real_id') else current_user.id
-        bookings = SlotBooking.query.filter_by(user_id=user_id).join(BookingSlot).all()
+        bookings = (SlotBooking.query
+                    .filter_by(user_id=user_id)
+                    .join(SlotBooking.slot)
+                    .options(db.contains_eager(SlotBooking.slot), db.joinedload(SlotBooking.vehicle))
+                    .all())
         
         bookings_data = []
         for booking in bookings:
@@ -1061,6 +1195,86 @@ def get_my_bookings():
 def admin_slot_management():
     return render_template('admin/slot_management.html')
 
+# Admin: per-endpoint request timings and connection pool usage
+@app.route('/api/admin/metrics')
+@api_login_required
+@admin_required
+def get_metrics():
+    return jsonify({
+        'enabled': metrics.enabled,
+        'endpoints': metrics.snapshot(),
+        'pool': pool_metrics(db.engine)
+    }), 200
+
+# Admin: vehicles due for service within a horizon, projected from service history by time and mileage
+@app.route('/api/admin/forecast')
+@api_login_required
+@admin_required
+def get_service_forecast():
+    try:
+        horizon_days = int(request.args.get('horizon_days', 30))
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({'error': 'horizon_days and limit must be integers'}), 400
+    # Overdue vehicles are always listed; horizon_days only reaches forward from today
+    if horizon_days < 0:
+        return jsonify({'error': 'horizon_days must not be negative'}), 400
+    due = due_list(horizon_days=horizon_days, limit=limit)
+    return jsonify({'horizon_days': horizon_days, 'count': len(due), 'vehicles': due}), 200
+
+# Admin: typeahead search over vehicles (plate, VIN, model), customers (name, email, phone) and service notes
+@app.route('/api/admin/search')
+@api_login_required
+@admin_required
+def admin_search():
+    """Prefix search for the admin typeahead.
+
+    On SQLite, bm25 ranks only the first RANK_CANDIDATES (500) matches FTS5 yields per table,
+    in rowid order: those are the first matches found, not the best 500. Without FTS5 (MySQL)
+    each field is matched with a LIKE prefix that no index serves, so every search scans.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({'query': query, **search(query, limit=min(limit, MAX_RESULTS))}), 200
+
+# Admin: time-in-state and turnaround percentiles per service type and per weekday slot, from ServiceHistory
+@app.route('/api/admin/analytics/turnaround')
+@api_login_required
+@admin_required
+def get_turnaround_analytics():
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    return jsonify(turnaround_report(start, end, app.config['SHOP_TIMEZONE'])), 200
+
+# Admin: stream services (with vehicle, owner and payments) or slot bookings as CSV or NDJSON
+@app.route('/api/admin/export/<dataset>')
+@api_login_required
+@admin_required
+def export_data(dataset):
+    exporters = {'services': services_export, 'bookings': bookings_export}
+    if dataset not in exporters:
+        return jsonify({'error': 'Unknown export'}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(FORMATS)}"}), 400
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    filename = f"{dataset}-{start or 'all'}-{end or 'all'}.{fmt}"
+    return Response(
+        stream_with_context(stream_rows(exporters[dataset](start, end), fmt)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 # Debug endpoint to check database status
 @app.route('/api/debug/db_status')
 def debug_db_status():
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import and_, insert, update, select, literal
+from models import db, SlotSettings, NonWorkingDay, BookingSlot, SlotBooking, Service, ServiceHistory
+from rollup import service_days, refresh_days
+
+DEFAULT_SLOT_TIMES = ('09:00 AM', '11:00 AM', '01:00 PM', '03:00 PM', '05:00 PM')
+
+WEEKEND_REASON = 'Weekend - No bookings available'
+
+# Seconds between checks of slot_settings.updated_at, so changes saved by other worker processes are picked up
+SLOT_SETTINGS_REVALIDATE = float(os.environ.get('SLOT_SETTINGS_REVALIDATE', 60))
+
+# Longest range of days that can be closed in one request
+MAX_CLOSURE_DAYS = 366
+
+# Seconds before a process rebuilds its holiday calendar, so days added through other workers show up
+HOLIDAY_CALENDAR_RELOAD = float(os.environ.get('HOLIDAY_CALENDAR_RELOAD', 60))
+
+
+@dataclass(frozen=True)
+class SlotConfig:
+    """Immutable, parsed snapshot of the SlotSettings row"""
+    slot_times: Tuple[str, ...] = DEFAULT_SLOT_TIMES
+    max_bookings_per_slot: int = 1
+    booking_advance_days: int = 30
+    default_slots_per_day: int = len(DEFAULT_SLOT_TIMES)
+    version: Optional[datetime] = None  # updated_at of the row it was read from; None for built-in defaults
+
+    @classmethod
+    def from_row(cls, settings):
+        if settings is None:
+            return cls()
+        try:
+            slot_times = tuple(json.loads(settings.slot_times)) if settings.slot_times else DEFAULT_SLOT_TIMES
+        except (TypeError, json.JSONDecodeError):
+            slot_times = DEFAULT_SLOT_TIMES
+        return cls(
+            slot_times=slot_times or DEFAULT_SLOT_TIMES,
+            max_bookings_per_slot=settings.max_bookings_per_slot or 1,
+            booking_advance_days=settings.booking_advance_days or 30,
+            default_slots_per_day=settings.default_slots_per_day or len(slot_times),
+            version=settings.updated_at,
+        )
+
+    def to_dict(self):
+        return {
+            'default_slots_per_day': self.default_slots_per_day,
+            'slot_times': list(self.slot_times),
+            'max_bookings_per_slot': self.max_bookings_per_slot,
+            'booking_advance_days': self.booking_advance_days
+        }
+
+
+class SlotSettingsProvider:
+    """Loads SlotSettings once per process and hands out the parsed snapshot.
+
+    manage_slot_settings calls refresh() after saving, so the writing process sees the
+    change immediately; other processes notice the new updated_at on their next check.
+    """
+
+    def __init__(self, revalidate_after=SLOT_SETTINGS_REVALIDATE, clock=time.monotonic):
+        self.revalidate_after = revalidate_after
+        self._clock = clock
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None or self._clock() - self._checked_at >= self.revalidate_after:
+            snapshot = self._revalidate()
+        return snapshot
+
+    def refresh(self, settings=None):
+        """Replace the snapshot, from the given row or by reloading it"""
+        if settings is None:
+            settings = SlotSettings.query.order_by(SlotSettings.id).first()
+        with self._lock:
+            self._snapshot = SlotConfig.from_row(settings)
+            self._checked_at = self._clock()
+            return self._snapshot
+
+    def _revalidate(self):
+        with self._lock:
+            if self._snapshot is not None and self._clock() - self._checked_at < self.revalidate_after:
+                return self._snapshot
+            # Only the version column is read unless it has moved
+            version = db.session.query(SlotSettings.updated_at).order_by(SlotSettings.id).limit(1).scalar()
+            if self._snapshot is None or version != self._snapshot.version:
+                self._snapshot = SlotConfig.from_row(SlotSettings.query.order_by(SlotSettings.id).first())
+            self._checked_at = self._clock()
+            return self._snapshot
+
+
+slot_settings = SlotSettingsProvider()
+
+
+class HolidayCalendar:
+    """Immutable index of non-working days answering "is this date bookable" without touching the database.
+
+    Exact dates are looked up by date and recurring holidays by (month, day), so a single
+    day costs O(1) and a range of k days O(k).
+    """
+
+    def __init__(self, days=()):
+        self._dates = {}
+        self._recurring = {}
+        for day, reason, is_recurring in days:
+            reason = reason or 'Non-working day'
+            self._dates[day] = reason
+            if is_recurring:
+                self._recurring[(day.month, day.day)] = reason
+
+    def closure_reason(self, day):
+        """Why day cannot be booked, or None when it is a working day"""
+        if day.weekday() in (5, 6):  # Saturday = 5, Sunday = 6
+            return WEEKEND_REASON
+        return self._dates.get(day) or self._recurring.get((day.month, day.day))
+
+    def is_bookable(self, day):
+        return self.closure_reason(day) is None
+
+    def closures(self, start, end):
+        """Map each closed day in [start, end] to its reason"""
+        closed = {}
+        day = start
+        while day <= end:
+            reason = self.closure_reason(day)
+            if reason:
+                closed[day] = reason
+            day += timedelta(days=1)
+        return closed
+
+
+class HolidayCalendarProvider:
+    """Builds the HolidayCalendar from non_working_days and keeps it for the process.
+
+    manage_non_working_days calls refresh() after adding or removing a day.
+    """
+
+    def __init__(self, reload_after=HOLIDAY_CALENDAR_RELOAD, clock=time.monotonic):
+        self.reload_after = reload_after
+        self._clock = clock
+        self._calendar = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        calendar = self._calendar
+        if calendar is None or self._clock() - self._loaded_at >= self.reload_after:
+            calendar = self.refresh()
+        return calendar
+
+    def refresh(self):
+        rows = db.session.query(NonWorkingDay.date, NonWorkingDay.reason, NonWorkingDay.is_recurring).all()
+        calendar = HolidayCalendar(rows)
+        with self._lock:
+            self._calendar = calendar
+            self._loaded_at = self._clock()
+        return calendar
+
+
+holiday_calendar = HolidayCalendarProvider()
+
+
+def close_days(start, end, reason, is_recurring, created_by):
+    """Mark every day in [start, end] non-working and cancel what was booked on them.
+
+    Uses a fixed number of set-based statements whatever the size of the range: the new
+    NonWorkingDay rows are inserted in one batch, scheduled services booked into those
+    days get a ServiceHistory entry and are cancelled, their confirmed bookings are
+    cancelled, and the slots are closed with their booking counts reset. Days already
+    marked are left as they are. The caller commits.
+    """
+    now = datetime.utcnow()
+    existing = {day for (day,) in db.session.query(NonWorkingDay.date).filter(NonWorkingDay.date.between(start, end))}
+    new_days = []
+    day = start
+    while day <= end:
+        if day not in existing:
+            new_days.append({'date': day, 'reason': reason, 'is_recurring': is_recurring,
+                             'created_by': created_by, 'created_at': now})
+        day += timedelta(days=1)
+    if not new_days:
+        return {'days_added': 0, 'bookings_cancelled': 0, 'services_cancelled': 0}
+    db.session.execute(insert(NonWorkingDay), new_days)
+
+    slot_ids = select(BookingSlot.id).where(BookingSlot.date.between(start, end))
+    confirmed = (SlotBooking.slot_id.in_(slot_ids), SlotBooking.status == 'confirmed')
+    scheduled = (Service.id.in_(select(SlotBooking.service_id).where(*confirmed)), Service.status == 'scheduled')
+
+    # History first: both the services and their bookings still carry their old status here
+    days = service_days(and_(*scheduled))
+    db.session.execute(
+        insert(ServiceHistory).from_select(
+            ['service_id', 'status', 'notes', 'created_at'],
+            select(Service.id, literal('cancelled'), literal(f'Cancelled: {reason} (non-working day)'),
+                   literal(now, db.DateTime)).where(*scheduled)
+        )
+    )
+    options = {'synchronize_session': False}
+    services_cancelled = db.session.execute(
+        update(Service).where(*scheduled).values(status='cancelled').execution_options(**options)
+    ).rowcount
+    bookings_cancelled = db.session.execute(
+        update(SlotBooking).where(*confirmed).values(status='cancelled', updated_at=now).execution_options(**options)
+    ).rowcount
+    db.session.execute(
+        update(BookingSlot).where(BookingSlot.date.between(start, end))
+        .values(is_available=False, current_bookings=0).execution_options(**options)
+    )
+    refresh_days(days)
+    return {'days_added': len(new_days), 'bookings_cancelled': bookings_cancelled,
+            'services_cancelled': services_cancelled}
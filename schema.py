@@ -0,0 +1,49 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from models import db
+
+
+def upgrade_schema(app):
+    """Bring an existing database up to date with the columns and indexes declared in models.py.
+
+    db.create_all() only creates tables that are missing, so databases created by
+    older versions never receive columns or indexes added later. Safe to run on every start.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    added = []
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                # Existing rows would have nothing to put in it
+                app.logger.warning('Skipping column %s.%s: NOT NULL without a server default', table.name, column.name)
+                continue
+            preparer = engine.dialect.identifier_preparer
+            with engine.begin() as conn:
+                conn.execute(text('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                    preparer.format_table(table),
+                    preparer.format_column(column),
+                    column.type.compile(dialect=engine.dialect),
+                )))
+            added.append(f'{table.name}.{column.name}')
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(engine)
+                created.append(index.name)
+            except IntegrityError:
+                # A unique index cannot be built while duplicate rows exist; leave them for an admin to resolve
+                app.logger.warning('Skipping index %s: existing rows contain duplicates', index.name)
+    if added:
+        app.logger.info('Added missing columns: %s', ', '.join(added))
+    if created:
+        app.logger.info('Created missing indexes: %s', ', '.join(created))
+    return added + created
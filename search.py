@@ -0,0 +1,238 @@
+import re
+from sqlalchemy import event, inspect, or_, select, text
+from models import db, User, Vehicle, Service
+
+# Rows indexed per batch when rebuilding
+REBUILD_CHUNK_SIZE = 5000
+
+# Typeahead requests are small; anything larger belongs on a listing page
+MAX_RESULTS = 50
+
+# Matches ranked per table and query. A one- or two-letter prefix can match most of the table,
+# and bm25 must score every row it orders; past this many the first matches are ranked instead
+RANK_CANDIDATES = 500
+
+# Prefix lengths kept as separate FTS5 indexes, so "KA", "KA0" and "KA01" each resolve with one lookup
+_PREFIX = '2 3 4'
+_MIN_PREFIX = 2
+_TOKENIZE = 'unicode61 remove_diacritics 2'
+
+
+def _compact(*values):
+    # Plates, VINs and phone numbers are typed without their separators as often as with them
+    return ' '.join(re.sub(r'\W|_', '', value).lower() for value in values if value)
+
+
+def _national(phone):
+    # The last ten digits, so a number stored with a country code is found by the local number too
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-10:] if len(digits) > 10 else None
+
+
+class _Index:
+    """One FTS5 table mirroring some columns of a model, keyed by the model's id as rowid"""
+
+    def __init__(self, table, model, columns, sources, weights):
+        self.table = table
+        self.model = model
+        self.columns = columns  # fts column -> function(obj) returning its text
+        self.sources = sources  # model attributes the columns are built from
+        self.weights = weights  # bm25 weight per column
+
+    def ddl(self):
+        return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(self.columns)}, prefix='{_PREFIX}', tokenize='{_TOKENIZE}')")
+
+    def values(self, obj):
+        return {'rowid': obj.id, **{column: value(obj) or '' for column, value in self.columns.items()}}
+
+    def delete_sql(self):
+        return text(f'DELETE FROM {self.table} WHERE rowid = :rowid')
+
+    def insert_sql(self):
+        names = ', '.join(self.columns)
+        params = ', '.join(f':{column}' for column in self.columns)
+        return text(f'INSERT INTO {self.table} (rowid, {names}) VALUES (:rowid, {params})')
+
+
+_INDEXES = (
+    _Index('vehicle_search', Vehicle, {
+        'license_plate': lambda v: v.license_plate,
+        'vin': lambda v: v.vin,
+        'model': lambda v: v.model,
+        'compact': lambda v: _compact(v.license_plate, v.vin),
+    }, sources=('license_plate', 'vin', 'model'), weights=(10.0, 6.0, 1.0, 8.0)),
+    _Index('user_search', User, {
+        'name': lambda u: u.name,
+        'email': lambda u: u.email,
+        'phone': lambda u: u.phone,
+        'compact': lambda u: _compact(u.phone, _national(u.phone)),
+    }, sources=('name', 'email', 'phone'), weights=(8.0, 6.0, 4.0, 4.0)),
+    _Index('service_search', Service, {
+        'notes': lambda s: s.notes,
+    }, sources=('notes',), weights=(1.0,)),
+)
+_BY_MODEL = {index.model: index for index in _INDEXES}
+
+# Whether the FTS5 tables exist, per database URL
+_available = {}
+
+_installed = False
+
+
+def init_app(app):
+    """Mirror inserts, updates and deletes of vehicles, customers and services into the search tables"""
+    global _installed
+    if not _installed:
+        event.listen(db.session, 'after_flush', _after_flush)
+        _installed = True
+
+
+def create_tables(engine):
+    """Create the FTS5 tables if they are missing; returns True when any was created (it then needs a rebuild)"""
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.begin() as conn:
+        existing = {name for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        missing = [index for index in _INDEXES if index.table not in existing]
+        for index in missing:
+            conn.execute(text(index.ddl()))
+    _available.pop(engine.url, None)
+    return bool(missing)
+
+
+def rebuild():
+    """Repopulate every search table from its base table; the caller commits"""
+    if not _enabled(db.session.connection()):
+        return 0
+    total = 0
+    for index in _INDEXES:
+        db.session.execute(text(f'DELETE FROM {index.table}'))
+        rows = db.session.execute(select(index.model).execution_options(yield_per=REBUILD_CHUNK_SIZE)).scalars()
+        for chunk in rows.partitions():
+            db.session.execute(index.insert_sql(), [index.values(obj) for obj in chunk])
+            total += len(chunk)
+        db.session.expunge_all()
+    return total
+
+
+def forget(model, condition):
+    """Drop the search rows of the model's rows matching condition; for bulk deletes that skip the flush"""
+    connection = db.session.connection()
+    if not _enabled(connection):
+        return
+    ids = db.session.execute(select(model.id).where(condition)).scalars().all()
+    if ids:
+        db.session.execute(_BY_MODEL[model].delete_sql(), [{'rowid': row_id} for row_id in ids])
+
+
+def search(query, limit=10):
+    """Vehicles, customers and services matching every word of query as a prefix, best matches first.
+
+    With FTS5 only the first RANK_CANDIDATES matches of each table, in rowid order, are
+    ranked, so a very broad prefix returns the best of those rather than of every match.
+    """
+    limit = max(1, min(limit, MAX_RESULTS))
+    tokens = [token for token in query.split() if re.search(r'[^\W_]', token)]
+    if not tokens:
+        return {'vehicles': [], 'customers': [], 'services': []}
+    if _enabled(db.session.connection()):
+        return _search_fts(tokens, limit)
+    return _search_like(tokens, limit)
+
+
+def _match_expression(tokens):
+    # Each token becomes a quoted prefix phrase of its words, so user input never reaches FTS5 query syntax
+    terms = []
+    for token in tokens:
+        parts = re.findall(r'[^\W_]+', token)
+        phrase = ' '.join(parts).lower()
+        compact = ''.join(parts).lower()
+        if phrase == compact:
+            terms.append(f'"{phrase}"*')
+        elif len(parts[-1]) < _MIN_PREFIX:
+            # "KA-0": a one-letter prefix has no prefix index and would scan every token starting
+            # with it; the compact column holds plates, VINs and phones without separators anyway
+            terms.append(f'"{compact}"*')
+        else:
+            terms.append(f'("{phrase}"* OR "{compact}"*)')
+    return ' AND '.join(terms)
+
+
+def _ranked(index, match, limit, columns, fts_columns=''):
+    weights = ', '.join(str(w) for w in index.weights)
+    base = db.engine.dialect.identifier_preparer.quote(index.model.__table__.name)
+    # FTS5 yields matches lazily, so the inner LIMIT also bounds how many rows are scored
+    sql = text(f'SELECT {columns} FROM (SELECT rowid, bm25({index.table}, {weights}) AS score{fts_columns} '
+               f'FROM {index.table} WHERE {index.table} MATCH :match LIMIT :candidates) AS hit '
+               f'JOIN {base} AS base ON base.id = hit.rowid ORDER BY hit.score LIMIT :limit')
+    return db.session.execute(sql, {'match': match, 'candidates': RANK_CANDIDATES, 'limit': limit}).mappings().all()
+
+
+def _search_fts(tokens, limit):
+    match = _match_expression(tokens)
+    vehicles = _ranked(_BY_MODEL[Vehicle], match, limit,
+                       'base.id, base.license_plate, base.vin, base.model, base.user_id')
+    customers = _ranked(_BY_MODEL[User], match, limit,
+                        'base.id, base.name, base.email, base.phone')
+    services = _ranked(_BY_MODEL[Service], match, limit,
+                       'base.id, base.service_type, base.status, base.scheduled_date, base.vehicle_id, hit.notes',
+                       fts_columns=", snippet(service_search, 0, '[', ']', '...', 12) AS notes")
+    return {
+        'vehicles': [dict(row) for row in vehicles],
+        'customers': [dict(row) for row in customers],
+        'services': [dict(row) for row in services],
+    }
+
+
+def _search_like(tokens, limit):
+    # Other databases: every token must start one of the fields. istartswith compiles to lower(column) LIKE,
+    # which no index serves, so on MySQL each search scans the vehicle, user and service tables
+    def matching(*columns):
+        return [or_(*[column.istartswith(token, autoescape=True) for column in columns]) for token in tokens]
+
+    vehicles = (Vehicle.query.filter(*matching(Vehicle.license_plate, Vehicle.vin, Vehicle.model))
+                .order_by(Vehicle.license_plate).limit(limit).all())
+    customers = (User.query.filter(*matching(User.name, User.email, User.phone))
+                 .order_by(User.name).limit(limit).all())
+    services = (Service.query.filter(*[Service.notes.icontains(token, autoescape=True) for token in tokens])
+                .order_by(Service.id.desc()).limit(limit).all())
+    return {
+        'vehicles': [{'id': v.id, 'license_plate': v.license_plate, 'vin': v.vin, 'model': v.model, 'user_id': v.user_id}
+                     for v in vehicles],
+        'customers': [{'id': u.id, 'name': u.name, 'email': u.email, 'phone': u.phone} for u in customers],
+        'services': [{'id': s.id, 'service_type': s.service_type, 'status': s.status, 'scheduled_date': s.scheduled_date,
+                      'vehicle_id': s.vehicle_id, 'notes': s.notes} for s in services],
+    }
+
+
+def _enabled(connection):
+    """FTS5 tables exist on this database (SQLite only, and only once init-db has created them)"""
+    url = connection.engine.url
+    if url not in _available:
+        _available[url] = connection.dialect.name == 'sqlite' and all(
+            connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                               {'name': index.table}).first() is not None
+            for index in _INDEXES
+        )
+    return _available[url]
+
+
+def _after_flush(session, flush_context):
+    changed = [obj for obj in list(session.new) + list(session.dirty) if type(obj) in _BY_MODEL]
+    deleted = [obj for obj in session.deleted if type(obj) in _BY_MODEL]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if not _enabled(connection):
+        return
+    for obj in deleted:
+        connection.execute(_BY_MODEL[type(obj)].delete_sql(), {'rowid': obj.id})
+    for obj in changed:
+        index = _BY_MODEL[type(obj)]
+        state = inspect(obj)
+        if obj not in session.new and not any(state.attrs[key].history.has_changes() for key in index.sources):
+            continue
+        connection.execute(index.delete_sql(), {'rowid': obj.id})
+        connection.execute(index.insert_sql(), index.values(obj))
+
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('vsrms.slow_query')
+
+# Distinct statements whose plan has been captured; bounded so ad-hoc SQL cannot grow it forever
+MAX_EXPLAINED_STATEMENTS = 10000
+
+_EXPLAIN_PREFIX = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+}
+
+
+def _param_shape(parameters):
+    """Types of the bound parameters, never their values"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """Writes statements slower than a threshold to a rotating log file.
+
+    Each entry records the duration, originating Flask endpoint, statement text and
+    bound-parameter types. The first time a statement is seen its EXPLAIN plan is
+    captured as well (SQLite and MySQL), which makes full table scans easy to spot.
+    """
+
+    def __init__(self):
+        self.threshold_ms = None
+        self._explained = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        self.threshold_ms = app.config['SLOW_QUERY_MS']
+        path = app.config['SLOW_QUERY_LOG']
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+            backupCount=app.config['SLOW_QUERY_LOG_BACKUPS']
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slowlog_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('slowlog_start')
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+
+        fingerprint = hashlib.sha1(statement.encode('utf-8')).hexdigest()[:12]
+        entry = {
+            'ms': round(elapsed_ms, 2),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'fingerprint': fingerprint,
+            'statement': ' '.join(statement.split()),
+        }
+        if executemany:
+            entry['params'] = _param_shape(parameters[0]) if parameters else []
+            entry['rows'] = len(parameters)
+        else:
+            entry['params'] = _param_shape(parameters)
+            plan = self._explain_once(conn, statement, parameters, context, fingerprint)
+            if plan is not None:
+                entry['plan'] = plan
+        logger.info(json.dumps(entry, default=str))
+
+    def _explain_once(self, conn, statement, parameters, context, fingerprint):
+        prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+        if prefix is None or statement.lstrip()[:6].upper() not in ('SELECT', 'UPDATE', 'DELETE'):
+            return None
+        # A streaming (unbuffered) cursor still owns the connection, so nothing else may run on it yet
+        if context is not None and context.execution_options.get('stream_results'):
+            return None
+        with self._lock:
+            if fingerprint in self._explained or len(self._explained) >= MAX_EXPLAINED_STATEMENTS:
+                return None
+            self._explained.add(fingerprint)
+        try:
+            explain_cursor = conn.connection.cursor()
+            try:
+                explain_cursor.execute(prefix + statement, parameters)
+                return [list(row) for row in explain_cursor.fetchall()]
+            finally:
+                explain_cursor.close()
+        except Exception as exc:
+            return f'unavailable: {exc}'
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,42 @@
+import os
+from sqlalchemy import func
+from cache import TTLCache
+from models import db, Vehicle, Service, Payment
+
+# Seconds a computed set of dashboard figures is reused before the next admin page load recomputes it
+DASHBOARD_STATS_TTL = int(os.environ.get('DASHBOARD_STATS_TTL', 30))
+
+_dashboard_cache = TTLCache(ttl=DASHBOARD_STATS_TTL, maxsize=1)
+
+
+def dashboard_stats():
+    """Vehicle, service status and payment totals for the admin dashboard, served from a short-lived cache"""
+    return _dashboard_cache.get_or_set('dashboard', _compute_dashboard_stats)
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached figures; call after committing a change to a Service status or a Payment"""
+    _dashboard_cache.clear()
+
+
+def _compute_dashboard_stats():
+    # One grouped aggregate per table instead of one COUNT(*) per figure
+    status_counts = dict(
+        db.session.query(Service.status, func.count(Service.id)).group_by(Service.status).all()
+    )
+    total_vehicles = db.session.query(func.count(Vehicle.id)).scalar()
+
+    payments = {}
+    for status, count, amount in (db.session.query(Payment.status, func.count(Payment.id), func.sum(Payment.amount))
+                                  .group_by(Payment.status).all()):
+        payments[status] = {'count': count, 'amount': float(amount or 0)}
+
+    return {
+        'total_vehicles': total_vehicles,
+        'total_services': sum(status_counts.values()),
+        'pending_services': status_counts.get('scheduled', 0),
+        'completed_services': status_counts.get('completed', 0),
+        'status_counts': status_counts,
+        'payments': payments,
+        'revenue': payments.get('completed', {}).get('amount', 0.0),
+    }
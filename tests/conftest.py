@@ -0,0 +1,85 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# create_app() reads DATABASE_URL when app is first imported, so point it at a throwaway file before that
+_DB_DIR = tempfile.mkdtemp(prefix='vsrms-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_DB_DIR, 'test.db')
+os.environ.setdefault('ASSET_PRECOMPRESS', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, init_db  # noqa: E402
+from models import db, User, Vehicle, Admin  # noqa: E402
+from identity import _identity_cache  # noqa: E402
+from scheduling import slot_settings, holiday_calendar  # noqa: E402
+from stats import invalidate_dashboard_stats  # noqa: E402
+import analytics  # noqa: E402
+import forecast  # noqa: E402
+import search  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    init_db()
+    yield flask_app
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """Empty every table and drop per-process caches after each test"""
+    yield
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        search.rebuild()
+        db.session.commit()
+        slot_settings.refresh()
+        holiday_calendar.refresh()
+    _identity_cache.clear()
+    invalidate_dashboard_stats()
+    analytics._report_cache.clear()
+    forecast._due_cache.clear()
+
+
+@pytest.fixture
+def make_customer(app):
+    """Factory creating customer n with one vehicle; returns (user_id, vehicle_id)"""
+    def make(n):
+        with app.app_context():
+            user = User(email=f'customer{n}@example.com', password='x', name=f'Customer {n}',
+                        phone=f'98{n:08d}', address='Test Street')
+            db.session.add(user)
+            db.session.flush()
+            vehicle = Vehicle(model='Civic', year=2020, license_plate=f'KA-01-{n:06d}', vin=f'VIN{n:014d}',
+                              odo_reading=1000, user_id=user.id)
+            db.session.add(vehicle)
+            db.session.commit()
+            return user.id, vehicle.id
+    return make
+
+
+@pytest.fixture
+def admin_id(app):
+    with app.app_context():
+        admin = Admin(name='Test Admin', email='admin@example.com', password='x')
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+@pytest.fixture
+def login(app):
+    """Factory for test clients logged in as a Flask-Login session ID ('user_<id>' or 'admin_<id>')"""
+    def make(session_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = session_id
+            session['_fresh'] = True
+        return client
+    return make
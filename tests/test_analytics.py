@@ -0,0 +1,42 @@
+"""Turnaround analytics compare shop-local slot times with UTC history timestamps on one clock"""
+from datetime import datetime
+
+import pytest
+
+from models import db, Service, ServiceHistory
+from analytics import turnaround_report
+
+
+def _service(user_id, vehicle_id, scheduled, started_utc, completed_utc):
+    service = Service(service_type='regular', status='completed', user_id=user_id, vehicle_id=vehicle_id,
+                      scheduled_date=scheduled)
+    db.session.add(service)
+    db.session.flush()
+    db.session.add_all([
+        ServiceHistory(service_id=service.id, status='scheduled', created_at=datetime(2024, 1, 1)),
+        ServiceHistory(service_id=service.id, status='in_progress', created_at=started_utc),
+        ServiceHistory(service_id=service.id, status='completed', created_at=completed_utc),
+    ])
+
+
+@pytest.mark.parametrize('timezone, scheduled, started_utc, completed_utc', [
+    # 10:00 IST is 04:30 UTC: work starts 15 minutes late and the car is ready two hours after the slot
+    ('Asia/Kolkata', datetime(2024, 3, 4, 10, 0), datetime(2024, 3, 4, 4, 45), datetime(2024, 3, 4, 6, 30)),
+    # London in summer is UTC+1 and in winter UTC+0; each date uses its own offset
+    ('Europe/London', datetime(2024, 7, 1, 10, 0), datetime(2024, 7, 1, 9, 15), datetime(2024, 7, 1, 11, 0)),
+    ('Europe/London', datetime(2024, 1, 15, 10, 0), datetime(2024, 1, 15, 10, 15), datetime(2024, 1, 15, 12, 0)),
+])
+def test_durations_use_the_shop_timezone(app, make_customer, timezone, scheduled, started_utc, completed_utc):
+    user_id, vehicle_id = make_customer(1)
+    with app.app_context():
+        _service(user_id, vehicle_id, scheduled, started_utc, completed_utc)
+        db.session.commit()
+        report = turnaround_report(timezone=timezone)
+
+    regular = report['by_service_type']['regular']
+    assert regular['start_delay_hours']['p50'] == 0.25
+    assert regular['work_hours']['p50'] == 1.75
+    assert regular['turnaround_hours']['p50'] == 2.0
+    assert report['timezone'] == timezone
+    # Slots are still grouped by the shop's own wall clock
+    assert report['by_weekday_slot'][0]['time'] == '10:00 AM'
@@ -0,0 +1,49 @@
+"""Precompressed landing-page assets: content negotiation, and recompression while a copy is being served"""
+import gzip
+import os
+
+import pytest
+
+from assets import AssetFingerprints
+
+
+@pytest.fixture
+def fingerprints(app, tmp_path):
+    root = tmp_path / 'landing-page'
+    (root / 'css').mkdir(parents=True)
+    (root / 'css' / 'site.css').write_text('body { margin: 0; }\n' * 200)
+    assets = AssetFingerprints()
+    assets.root = str(root)
+    assets.gzip_dir = str(tmp_path / 'compressed-assets')
+    return assets
+
+
+@pytest.mark.parametrize('accept_encoding, gzipped', [
+    ('gzip', True),
+    ('br, gzip;q=0.5', True),
+    ('*', True),
+    ('gzip;q=0', False),
+    ('identity', False),
+    (None, False),
+])
+def test_gzip_only_when_accepted(app, fingerprints, accept_encoding, gzipped):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    with app.test_request_context('/css/site.css', headers=headers):
+        response = fingerprints.send('css', 'site.css')
+        response.close()
+    assert (response.headers.get('Content-Encoding') == 'gzip') is gzipped
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_recompressing_a_changed_file_leaves_open_copies_intact(fingerprints, tmp_path):
+    source = tmp_path / 'landing-page' / 'css' / 'site.css'
+    compressed = fingerprints._entry('css/site.css')[3]
+    with open(compressed, 'rb') as being_served:
+        source.write_text('p { padding: 0; }\n' * 300)
+        os.utime(source, ns=(0, 0))
+        assert fingerprints._entry('css/site.css')[3] == compressed
+        # The old copy was replaced by a rename, not rewritten under the open handle
+        assert gzip.decompress(being_served.read()) == b'body { margin: 0; }\n' * 200
+    with open(compressed, 'rb') as f:
+        assert gzip.decompress(f.read()) == b'p { padding: 0; }\n' * 300
+    assert os.listdir(os.path.dirname(compressed)) == ['site.css.gz']
@@ -0,0 +1,77 @@
+"""Stress tests for /api/book_slot: many threads booking one slot must never push it past max_bookings.
+
+Run with ``pytest -s`` to see the measured bookings per second.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from models import db, BookingSlot, SlotBooking, Service
+
+THREADS = 8
+BOOKINGS_PER_THREAD = 5
+
+
+def _next_weekday():
+    day = date.today() + timedelta(days=7)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def _hammer(app, make_customer, login, max_bookings):
+    """Book one slot from THREADS threads at once; returns (slot_id, [(status, body)], seconds)"""
+    with app.app_context():
+        slot = BookingSlot(date=_next_weekday(), time='09:00 AM', max_bookings=max_bookings, current_bookings=0)
+        db.session.add(slot)
+        db.session.commit()
+        slot_id = slot.id
+    customers = [make_customer(n) for n in range(THREADS)]
+
+    results = []
+    results_lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def book(user_id, vehicle_id):
+        client = login(f'user_{user_id}')
+        start.wait()
+        for _ in range(BOOKINGS_PER_THREAD):
+            response = client.post('/api/book_slot', json={
+                'slot_id': slot_id, 'vehicle_id': vehicle_id, 'service_type': 'regular'})
+            with results_lock:
+                results.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=book, args=customer) for customer in customers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return slot_id, results, time.perf_counter() - started
+
+
+def _assert_booked(app, slot_id, count):
+    with app.app_context():
+        assert db.session.get(BookingSlot, slot_id).current_bookings == count
+        assert SlotBooking.query.filter_by(slot_id=slot_id).count() == count
+        assert Service.query.count() == count
+
+
+def test_concurrent_bookings_never_overbook_a_slot(app, make_customer, login):
+    slot_id, results, elapsed = _hammer(app, make_customer, login, max_bookings=5)
+
+    assert len(results) == THREADS * BOOKINGS_PER_THREAD
+    assert sum(1 for status, _ in results if status == 200) == 5
+    # Everything else was turned away for capacity, not by an error such as "database is locked"
+    assert all(body['error'] == 'Slot is fully booked' for status, body in results if status != 200)
+    _assert_booked(app, slot_id, 5)
+    print(f'\n{len(results)} requests for 5 places from {THREADS} threads: {len(results) / elapsed:.0f} requests/s')
+
+
+def test_concurrent_booking_throughput(app, make_customer, login):
+    total = THREADS * BOOKINGS_PER_THREAD
+    slot_id, results, elapsed = _hammer(app, make_customer, login, max_bookings=total)
+
+    assert [status for status, _ in results] == [200] * total
+    _assert_booked(app, slot_id, total)
+    print(f'\n{total} bookings from {THREADS} threads in {elapsed:.2f} s: {total / elapsed:.0f} bookings/s')
@@ -0,0 +1,36 @@
+"""Service-due forecast endpoint: parameter validation and the ranked due-list"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Service
+
+
+@pytest.fixture
+def admin_client(admin_id, login):
+    return login(f'admin_{admin_id}')
+
+
+@pytest.fixture
+def fleet(app, make_customer):
+    """Three vehicles whose last oil change was long enough ago that they are all overdue"""
+    customers = [make_customer(n) for n in range(3)]
+    with app.app_context():
+        for n, (user_id, vehicle_id) in enumerate(customers):
+            day = datetime.utcnow() - timedelta(days=400 + n)
+            db.session.add(Service(user_id=user_id, vehicle_id=vehicle_id, service_type='oil',
+                                   status='completed', scheduled_date=day, actual_date=day))
+        db.session.commit()
+    return customers
+
+
+@pytest.mark.parametrize('limit, count', [('2', 2), ('-5', 1), ('0', 1), ('5000', 3)])
+def test_limit_is_clamped(admin_client, fleet, limit, count):
+    response = admin_client.get('/api/admin/forecast', query_string={'limit': limit})
+    assert response.status_code == 200
+    assert response.get_json()['count'] == count
+
+
+def test_negative_horizon_is_rejected(admin_client, fleet):
+    response = admin_client.get('/api/admin/forecast', query_string={'horizon_days': '-1'})
+    assert response.status_code == 400
@@ -0,0 +1,25 @@
+"""Identity cache: reads may reuse a cached account, writes always see the current row"""
+from sqlalchemy import delete
+
+from models import db, User, Vehicle
+from identity import load_identity
+
+
+def _delete_elsewhere(user_id):
+    # Another worker deleting the account: this process's cache is not told
+    db.session.execute(delete(Vehicle).where(Vehicle.user_id == user_id))
+    db.session.execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+
+
+def test_writes_do_not_trust_a_cached_account(app, make_customer):
+    user_id, _ = make_customer(1)
+    session_id = f'user_{user_id}'
+    with app.test_request_context('/dashboard'):
+        assert load_identity(session_id).id == user_id
+        _delete_elsewhere(user_id)
+
+    with app.test_request_context('/dashboard'):
+        assert load_identity(session_id).id == user_id
+    with app.test_request_context('/book_service', method='POST'):
+        assert load_identity(session_id) is None
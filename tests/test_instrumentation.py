@@ -0,0 +1,53 @@
+"""Request metrics: streamed responses are measured over their whole body, not up to the first byte"""
+import time
+
+import pytest
+from flask import Flask, Response, stream_with_context
+from sqlalchemy import create_engine, text
+
+from instrumentation import RequestMetrics
+
+
+@pytest.fixture
+def instrumented():
+    app = Flask(__name__)
+    engine = create_engine('sqlite://')
+    metrics = RequestMetrics()
+    metrics.init_app(app, engine)
+
+    @app.route('/plain')
+    def plain():
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        return 'ok'
+
+    @app.route('/stream')
+    def stream():
+        def rows():
+            with engine.connect() as conn:
+                for _ in range(3):
+                    time.sleep(0.02)
+                    yield f'{conn.execute(text("SELECT 1")).scalar()}\n'
+        return Response(stream_with_context(rows()))
+
+    return app.test_client(), metrics
+
+
+def test_plain_responses_carry_server_timing(instrumented):
+    client, metrics = instrumented
+    response = client.get('/plain')
+    assert 'desc="1 queries"' in response.headers['Server-Timing']
+    assert metrics.snapshot()['plain']['mean_queries'] == 1
+
+
+def test_streamed_responses_are_recorded_when_closed(instrumented):
+    client, metrics = instrumented
+    response = client.get('/stream')
+    assert 'Server-Timing' not in response.headers
+    assert response.get_data() == b'1\n1\n1\n'
+    assert 'stream' not in metrics.snapshot()
+
+    response.close()
+    stats = metrics.snapshot()['stream']
+    assert (stats['requests'], stats['mean_queries']) == (1, 3)
+    assert stats['mean_ms'] >= 60
@@ -0,0 +1,65 @@
+"""The booking listings must run a fixed number of queries however many bookings they return"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Service, BookingSlot, SlotBooking
+
+MANY = 25
+
+
+def _add_bookings(app, customers, first_day, count):
+    """Book count slots on consecutive days, cycling through customers so rows have distinct users and vehicles"""
+    with app.app_context():
+        for i in range(count):
+            user_id, vehicle_id = customers[i % len(customers)]
+            slot = BookingSlot(date=first_day + timedelta(days=i), time='09:00 AM', max_bookings=1, current_bookings=1)
+            service = Service(service_type='regular', status='scheduled', vehicle_id=vehicle_id, user_id=user_id)
+            db.session.add_all([slot, service])
+            db.session.flush()
+            db.session.add(SlotBooking(slot_id=slot.id, service_id=service.id, user_id=user_id, vehicle_id=vehicle_id,
+                                       service_type='regular'))
+        db.session.commit()
+
+
+def _count_queries(app, client, url):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, response.get_json()
+    return len(statements), response.get_json()['bookings']
+
+
+@pytest.mark.parametrize('role', ['admin', 'user'])
+def test_booking_listings_run_a_constant_number_of_queries(app, make_customer, admin_id, login, role):
+    customers = [make_customer(n) for n in range(5)]
+    first_day = date(2030, 1, 1)
+    if role == 'admin':
+        client = login(f'admin_{admin_id}')
+        url = f'/api/admin/bookings?start={first_day}&end={first_day + timedelta(days=MANY)}'
+    else:
+        # One customer owns every booking, so /api/my_bookings returns them all
+        customers = customers[:1]
+        client = login(f'user_{customers[0][0]}')
+        url = '/api/my_bookings'
+
+    _add_bookings(app, customers, first_day, 1)
+    # Warm the account cache so both measured requests load the same things
+    client.get(url)
+    one_count, one = _count_queries(app, client, url)
+
+    _add_bookings(app, customers, first_day + timedelta(days=1), MANY - 1)
+    many_count, many = _count_queries(app, client, url)
+
+    assert (len(one), len(many)) == (1, MANY)
+    assert many_count == one_count
@@ -0,0 +1,123 @@
+"""EXPLAIN QUERY PLAN checks for the hot route queries, against a database migrated by upgrade_schema.
+
+Each route below is requested with every SELECT it runs recorded; each recorded statement
+is then explained with its own parameters, and any table it reads with a plain scan
+(no index) fails the test.
+"""
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, inspect
+
+import routes
+from models import db, Service, ServiceHistory, Payment, BookingSlot, SlotBooking
+from schema import upgrade_schema
+
+# Read whole by design: the single settings row and the holiday calendar loaded into memory
+WHOLE_TABLE_READS = {'slot_settings', 'non_working_days'}
+
+CUSTOMER_ROUTES = (
+    '/customer_dashboard',
+    '/view_vehicles',
+    '/view_services',
+    '/service_history',
+    '/view_payments',
+    '/service_details/{service_id}',
+    '/api/my_bookings',
+    '/api/slots/{slot_date}',
+)
+ADMIN_ROUTES = (
+    '/admin/dashboard',
+    '/admin/services',
+    '/admin/services?status=scheduled',
+    '/service_history',
+    '/view_payments',
+    '/admin/service/{service_id}',
+    '/api/admin/bookings?start={slot_date}&end={slot_date}',
+)
+
+
+@pytest.fixture
+def migrated(app):
+    """Drop every declared index, as in a database created before they existed, then let upgrade_schema add them back"""
+    with app.app_context():
+        tables = {table.name for table in db.metadata.sorted_tables}
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(db.engine)
+        assert not [i for t in tables for i in inspect(db.engine).get_indexes(t) if not i['name'].startswith('sqlite_')]
+        upgrade_schema(app)
+
+
+@pytest.fixture
+def seeded(app, make_customer, admin_id):
+    user_id, vehicle_id = make_customer(1)
+    make_customer(2)
+    slot_date = date.today() + timedelta(days=7)
+    while slot_date.weekday() >= 5:
+        slot_date += timedelta(days=1)
+    with app.app_context():
+        service = Service(service_type='regular', status='scheduled', vehicle_id=vehicle_id, user_id=user_id,
+                          scheduled_date=datetime.combine(slot_date, datetime.min.time()), cost=100)
+        db.session.add(service)
+        db.session.flush()
+        slot = BookingSlot(date=slot_date, time='09:00 AM', max_bookings=2, current_bookings=1)
+        db.session.add(slot)
+        db.session.flush()
+        db.session.add_all([
+            ServiceHistory(service_id=service.id, status='scheduled'),
+            Payment(service_id=service.id, amount=100, status='pending'),
+            SlotBooking(slot_id=slot.id, service_id=service.id, user_id=user_id, vehicle_id=vehicle_id,
+                        service_type='regular'),
+        ])
+        db.session.commit()
+        return {'user_id': user_id, 'admin_id': admin_id, 'service_id': service.id, 'slot_date': slot_date.isoformat()}
+
+
+def _recorded_selects(app, client, urls, seeded):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for url in urls:
+            url = url.format(**seeded)
+            response = client.get(url)
+            assert response.status_code < 400, (url, response.status_code)
+            yield url, list(statements)
+            statements.clear()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _table_scans(app, statement, parameters):
+    with app.app_context():
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = []
+    for row in plan:
+        match = re.fullmatch(r'SCAN (\w+)(?: AS \w+)?', row[-1])
+        if match and match.group(1) not in WHOLE_TABLE_READS:
+            scans.append(row[-1])
+    return scans
+
+
+@pytest.mark.parametrize('role, urls', [('user', CUSTOMER_ROUTES), ('admin', ADMIN_ROUTES)])
+def test_hot_queries_use_indexes(app, migrated, seeded, login, monkeypatch, role, urls):
+    # The HTML templates are not needed to see which queries a page runs
+    monkeypatch.setattr(routes, 'render_template', lambda *args, **kwargs: '')
+    client = login(f"{role}_{seeded['user_id'] if role == 'user' else seeded['admin_id']}")
+
+    failures = []
+    for url, statements in _recorded_selects(app, client, urls, seeded):
+        assert statements, url
+        for statement, parameters in statements:
+            scans = _table_scans(app, statement, parameters)
+            if scans:
+                failures.append(f'{url}: {", ".join(scans)}\n    {" ".join(statement.split())}')
+    assert not failures, 'Queries falling back to a table scan:\n' + '\n'.join(failures)
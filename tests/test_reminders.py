@@ -0,0 +1,102 @@
+"""Service reminder job: failed sends and abandoned claims are retried, sent reminders are not repeated"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Vehicle, ServiceReminder
+from reminders import ReminderJob
+
+
+class RecordingSender:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.messages = []
+
+    def send(self, message):
+        if self.fail:
+            raise ConnectionError('SMTP server unavailable')
+        self.messages.append(message)
+
+
+@pytest.fixture
+def due_vehicles(app, make_customer):
+    """Three customers whose vehicles are due for service in three days"""
+    due = (datetime.utcnow() + timedelta(days=3)).replace(microsecond=0)
+    vehicles = [make_customer(n)[1] for n in range(3)]
+    with app.app_context():
+        for vehicle_id in vehicles:
+            db.session.get(Vehicle, vehicle_id).next_service_date = due
+        db.session.commit()
+    return vehicles
+
+
+def _run(app, sender, **options):
+    with app.app_context():
+        return ReminderJob(app, sender, rate=1000, **options).run()
+
+
+def _statuses(app):
+    with app.app_context():
+        return sorted(status for (status,) in db.session.query(ServiceReminder.status))
+
+
+def test_sent_reminders_are_not_repeated(app, due_vehicles):
+    first = _run(app, RecordingSender())
+    second = _run(app, RecordingSender())
+    assert (first['sent'], second['sent'], second['already_sent']) == (3, 0, 3)
+
+
+def test_failed_sends_are_retried_by_the_next_run(app, due_vehicles):
+    failed = _run(app, RecordingSender(fail=True))
+    assert failed['failed'] == 3 and _statuses(app) == ['failed'] * 3
+
+    sender = RecordingSender()
+    retry = _run(app, sender)
+    assert (retry['retried'], retry['sent'], retry['already_sent']) == (3, 3, 0)
+    assert len(sender.messages) == 3
+    assert _statuses(app) == ['sent'] * 3
+
+
+def test_only_abandoned_pending_claims_are_retried(app, due_vehicles):
+    _run(app, RecordingSender())
+    now = datetime.utcnow()
+    with app.app_context():
+        reminders = ServiceReminder.query.order_by(ServiceReminder.vehicle_id).all()
+        # A run died two hours ago after claiming the first; another is sending the second right now
+        reminders[0].status, reminders[0].claimed_at = 'pending', now - timedelta(hours=2)
+        reminders[1].status, reminders[1].claimed_at = 'pending', now - timedelta(minutes=1)
+        db.session.commit()
+        abandoned = reminders[0].vehicle_id
+
+    sender = RecordingSender()
+    result = _run(app, sender, pending_timeout_minutes=60)
+    assert (result['retried'], result['sent'], result['already_sent']) == (1, 1, 2)
+    assert [message['vehicle_id'] for message in sender.messages] == [abandoned]
+    assert _statuses(app) == ['pending', 'sent', 'sent']
+
+
+def test_batch_size_is_not_capped_by_the_listing_page_limit(app, due_vehicles, monkeypatch):
+    import reminders
+    pages = []
+    paginate = reminders.keyset_paginate
+
+    def recording_paginate(*args, **kwargs):
+        page = paginate(*args, **kwargs)
+        pages.append(page.per_page)
+        return page
+
+    monkeypatch.setattr(reminders, 'keyset_paginate', recording_paginate)
+    result = _run(app, RecordingSender(), batch_size=500)
+    assert result['sent'] == 3
+    assert pages == [500]
+
+
+def test_batch_size_must_be_positive(app):
+    with pytest.raises(ValueError):
+        ReminderJob(app, RecordingSender(), batch_size=0)
+
+
+@pytest.mark.parametrize('rate', [0, -1])
+def test_rate_must_be_positive(app, rate):
+    with pytest.raises(ValueError):
+        ReminderJob(app, RecordingSender(), rate=rate)
@@ -0,0 +1,89 @@
+"""service_daily_rollup stays equal to a full recomputation after bulk changes"""
+from datetime import datetime, timedelta
+
+from models import db, Service, Payment, ServiceDailyRollup
+from purge import purge_user
+import rollup
+
+FIRST_DAY = datetime(2020, 1, 1, 10, 0)
+
+
+def _add_services(user_id, vehicle_id, days, service_type='regular'):
+    """One completed service per day with a completed payment, inserted in bulk"""
+    db.session.execute(db.insert(Service), [
+        {'user_id': user_id, 'vehicle_id': vehicle_id, 'service_type': service_type, 'status': 'completed',
+         'scheduled_date': FIRST_DAY + timedelta(days=day), 'cost': 100}
+        for day in days
+    ])
+    service_ids = db.session.query(Service.id).filter(Service.user_id == user_id).all()
+    db.session.execute(db.insert(Payment), [
+        {'service_id': service_id, 'amount': 100, 'status': 'completed'} for (service_id,) in service_ids
+    ])
+
+
+def _rollup_rows():
+    return sorted(
+        db.session.query(ServiceDailyRollup.day, ServiceDailyRollup.service_type, ServiceDailyRollup.status,
+                         ServiceDailyRollup.service_count, ServiceDailyRollup.total_cost,
+                         ServiceDailyRollup.paid_amount).all()
+    )
+
+
+def _assert_matches_rebuild():
+    rows = _rollup_rows()
+    rollup.rebuild()
+    assert rows == _rollup_rows()
+
+
+def test_purging_a_customer_with_thousands_of_service_days(app, make_customer):
+    long_time = make_customer(1)
+    other = make_customer(2)
+    with app.app_context():
+        # More distinct days than SQLite's expression depth limit of 1000
+        _add_services(*long_time, range(1500))
+        _add_services(*other, range(0, 1500, 100), service_type='oil')
+        rollup.rebuild()
+        db.session.commit()
+
+        purge_user(long_time[0])
+        db.session.commit()
+
+        assert Service.query.filter_by(user_id=long_time[0]).count() == 0
+        rows = _rollup_rows()
+        assert len(rows) == 15 and {row.service_type for row in rows} == {'oil'}
+        _assert_matches_rebuild()
+
+
+def test_refresh_days_recomputes_only_the_given_days(app, make_customer):
+    customer = make_customer(1)
+    with app.app_context():
+        _add_services(*customer, range(1200))
+        rollup.rebuild()
+        db.session.commit()
+        # Bulk statements bypass the flush listener, so the rollup is now stale for these days
+        db.session.execute(db.update(Service).where(Service.scheduled_date < FIRST_DAY + timedelta(days=700))
+                           .values(status='cancelled').execution_options(synchronize_session=False))
+        rollup.refresh_days([(FIRST_DAY + timedelta(days=day)).date() for day in range(700)])
+        db.session.commit()
+
+        statuses = {}
+        for row in _rollup_rows():
+            statuses[row.status] = statuses.get(row.status, 0) + row.service_count
+        assert statuses == {'cancelled': 700, 'completed': 500}
+        _assert_matches_rebuild()
+
+
+def test_init_db_fills_a_newly_added_rollup_table(app, make_customer):
+    from app import init_db
+    customer = make_customer(1)
+    with app.app_context():
+        _add_services(*customer, range(30))
+        db.session.commit()
+        # As in a database created before the rollup existed
+        ServiceDailyRollup.__table__.drop(db.engine)
+
+    init_db()
+
+    with app.app_context():
+        assert sum(row.service_count for row in _rollup_rows()) == 30
+        _assert_matches_rebuild()
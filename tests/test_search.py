@@ -0,0 +1,70 @@
+"""FTS5 search tables stay equal to a full rebuild after ORM changes and purges"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, Service, User, Vehicle
+from purge import purge_user, purge_vehicle
+import search
+
+
+def _add_service(user_id, vehicle_id, notes):
+    service = Service(user_id=user_id, vehicle_id=vehicle_id, service_type='regular', status='completed',
+                      scheduled_date=datetime(2024, 1, 1, 10, 0), notes=notes)
+    db.session.add(service)
+    db.session.commit()
+    return service.id
+
+
+def _index_rows():
+    return {index.table: sorted(tuple(row) for row in db.session.execute(text(f'SELECT rowid, * FROM {index.table}')))
+            for index in search._INDEXES}
+
+
+def _assert_matches_rebuild():
+    rows = _index_rows()
+    search.rebuild()
+    assert rows == _index_rows()
+
+
+def _found(query, kind):
+    return [row['id'] for row in search.search(query)[kind]]
+
+
+def test_orm_updates_are_mirrored(app, make_customer):
+    user_id, vehicle_id = make_customer(1)
+    with app.app_context():
+        service_id = _add_service(user_id, vehicle_id, 'brake pads replaced')
+        assert _found('KA-01-000001', 'vehicles') == [vehicle_id]
+
+        db.session.get(Vehicle, vehicle_id).license_plate = 'MH-12-AB-1234'
+        db.session.get(Service, service_id).notes = 'coolant leak fixed'
+        db.session.get(User, user_id).phone = '+91 99887 76655'
+        db.session.commit()
+
+        assert _found('KA-01-000001', 'vehicles') == []
+        assert _found('MH12AB', 'vehicles') == [vehicle_id]
+        assert _found('brake', 'services') == []
+        assert _found('coolant', 'services') == [service_id]
+        assert _found('9988776655', 'customers') == [user_id]
+        _assert_matches_rebuild()
+
+
+def test_purges_remove_search_rows(app, make_customer):
+    purged_user, purged_user_vehicle = make_customer(1)
+    kept_user, purged_vehicle = make_customer(2)
+    with app.app_context():
+        db.session.add(Vehicle(model='Swift', year=2021, license_plate='KA-02-XY-0001', vin='VIN2SECOND0000',
+                               odo_reading=10, user_id=kept_user))
+        db.session.commit()
+        _add_service(purged_user, purged_user_vehicle, 'clutch noise')
+        _add_service(kept_user, purged_vehicle, 'clutch replaced')
+
+        purge_user(purged_user)
+        purge_vehicle(purged_vehicle)
+        db.session.commit()
+
+        assert _found('customer', 'customers') == [kept_user]
+        assert [row['license_plate'] for row in search.search('KA')['vehicles']] == ['KA-02-XY-0001']
+        assert _found('clutch', 'services') == []
+        _assert_matches_rebuild()